@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from sqlmodel import Session, select
-from config.database import engine
+from fastapi import APIRouter, Depends
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.database import get_session
 from models.user import User, UserRead
-from core.auth import get_current_user
+from core.auth import get_current_user, invalidate_session, issue_signed_token, security
 
 
 
@@ -11,9 +11,30 @@ from core.auth import get_current_user
 router = APIRouter()
 
 @router.get("/me", response_model=UserRead)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     """
     Returns current authenticated user's profile information.
     The session is validated via the Better Auth session table in get_current_user.
     """
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.post("/token")
+async def create_signed_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Exchanges a Better Auth session token for a short-lived signed token.
+    Signed tokens are verified without a database lookup (AUTH_SIGNED_TOKENS=true).
+    """
+    token, expires_at = await issue_signed_token(session, credentials.credentials)
+    return {"access_token": token, "token_type": "bearer", "expires_at": expires_at}
+
+@router.post("/sign-out")
+def sign_out(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Drops the caller's session from the backend auth cache.
+    Call after Better Auth sign-out so the revoked token stops working immediately.
+    """
+    invalidate_session(credentials.credentials)
+    return {"message": "Session invalidated"}
@@ -1,14 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from sqlmodel import Session, select
-from config.database import engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.database import get_session
 from models.user import User
 from models.conversation import Conversation
 from models.message import Message
 from core.auth import get_current_user
+from core.fast_json import FastJSONResponse, rows_as_dicts
 from mcp.server import Server
-from mcp_service.tools import add_task, list_tasks, update_task, delete_task, complete_task
+from mcp_service.tools import (
+    add_task, list_tasks, search_tasks, update_task, delete_task, complete_task,
+    update_task_by_title, delete_task_by_title, complete_task_by_title
+)
 import openai
 import json
 import os
@@ -17,7 +22,7 @@ router = APIRouter()
 
 # Initialize OpenAI client
 # Initialize OpenAI client
-client = openai.OpenAI(
+client = openai.AsyncOpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
     base_url=os.getenv("OPENAI_BASE_URL")
 )
@@ -58,17 +63,35 @@ TOOLS = [
         "type": "function",
         "function": {
             "name": "list_tasks",
-            "description": "List user tasks with filtering and sorting",
+            "description": "List user tasks with status or tag filtering and sorting",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "status": {"type": "string", "enum": ["all", "pending", "completed"]},
-                    "sort": {"type": "string", "enum": ["created_at", "priority", "due_date"]}
+                    "sort": {"type": "string", "enum": ["created_at", "priority", "due_date"]},
+                    "tag": {"type": "string", "description": "Only tasks carrying this tag"},
+                    "since": {"type": "string", "description": "Sync token from a previous list_tasks call (\"0\" for the first) to fetch only changes and deletions"}
                 },
                 "required": []
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_tasks",
+            "description": "Find tasks by words in their title, description or tags, best match first",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string"},
+                    "status": {"type": "string", "enum": ["all", "pending", "completed"]},
+                    "limit": {"type": "integer", "description": "Maximum results (default 10)"}
+                },
+                "required": ["query"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -116,172 +139,239 @@ TOOLS = [
                 "required": ["task_id"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "complete_task_by_title",
+            "description": "Mark the pending task whose title best matches as complete; returns candidates if ambiguous",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task_title": {"type": "string", "description": "The task's title as the user referred to it"}
+                },
+                "required": ["task_title"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_task_by_title",
+            "description": "Update the task whose title best matches; returns candidates if ambiguous",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task_title": {"type": "string", "description": "The task's current title as the user referred to it"},
+                    "title": {"type": "string", "description": "New title"},
+                    "description": {"type": "string"},
+                    "priority": {"type": "string", "enum": ["low", "medium", "high"]},
+                    "tags": {"type": "string"},
+                    "due_date": {"type": "string"},
+                    "status": {"type": "string", "enum": ["pending", "completed"]}
+                },
+                "required": ["task_title"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_task_by_title",
+            "description": "Delete the task whose title is or contains the given text; returns candidates otherwise",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task_title": {"type": "string", "description": "The task's title as the user referred to it"}
+                },
+                "required": ["task_title"]
+            }
+        }
     }
 ]
 
-def execute_tool(name: str, args: Dict[str, Any], user_id: str):
-    """Execute tool call based on name."""
+async def execute_tool(session: AsyncSession, name: str, args: Dict[str, Any], user_id: str):
+    """Execute tool call based on name within the request's session."""
     if name == "add_task":
-        return add_task(user_id, **args)
+        return await add_task(session, user_id, **args)
     elif name == "list_tasks":
-        return list_tasks(user_id, **args)
+        return await list_tasks(session, user_id, **args)
+    elif name == "search_tasks":
+        return await search_tasks(session, user_id, **args)
     elif name == "update_task":
-        return update_task(user_id, **args)
+        return await update_task(session, user_id, **args)
     elif name == "delete_task":
-        return delete_task(user_id, **args)
+        return await delete_task(session, user_id, **args)
     elif name == "complete_task":
-        return complete_task(user_id, **args)
+        return await complete_task(session, user_id, **args)
+    elif name == "complete_task_by_title":
+        return await complete_task_by_title(session, user_id, **args)
+    elif name == "update_task_by_title":
+        return await update_task_by_title(session, user_id, **args)
+    elif name == "delete_task_by_title":
+        return await delete_task_by_title(session, user_id, **args)
     return {"error": "Unknown tool"}
 
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest, current_user: User = Depends(get_current_user)):
+async def chat(request: ChatRequest, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     user_id = current_user.id
     
-    with Session(engine) as session:
-        # 1. Get or Create Conversation
-        if request.conversation_id:
-            conversation = session.get(Conversation, request.conversation_id)
-            if not conversation or conversation.user_id != user_id:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-        else:
-            conversation = Conversation(user_id=user_id, title=request.message[:50])
-            session.add(conversation)
-            session.commit()
-            session.refresh(conversation)
+    # 1. Get or Create Conversation
+    if request.conversation_id:
+        conversation = await session.get(Conversation, request.conversation_id)
+        if not conversation or conversation.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    else:
+        conversation = Conversation(user_id=user_id, title=request.message[:50])
+        session.add(conversation)
+        await session.commit()
+        await session.refresh(conversation)
 
-        # 2. Add User Message to History
-        user_msg = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=request.message
-        )
-        session.add(user_msg)
-        session.commit()
+    # 2. Add User Message to History
+    user_msg = Message(
+        conversation_id=conversation.id,
+        role="user",
+        content=request.message
+    )
+    session.add(user_msg)
+    await session.commit()
 
-        # 3. Load History for Context (last 10 messages)
-        history_stmt = select(Message).where(Message.conversation_id == conversation.id).order_by(Message.created_at.desc()).limit(10)
-        history_msgs = session.exec(history_stmt).all()
-        history_msgs = sorted(history_msgs, key=lambda x: x.created_at)
-        
-        messages = [{"role": "system", "content": "You are a helpful Todo assistant. Use the tools provided to manage tasks."}]
-        for msg in history_msgs:
-            messages.append({"role": msg.role, "content": msg.content})
+    # 3. Load History for Context (last 10 messages)
+    history_stmt = select(Message).where(Message.conversation_id == conversation.id).order_by(Message.created_at.desc()).limit(10)
+    history_msgs = (await session.exec(history_stmt)).all()
+    history_msgs = sorted(history_msgs, key=lambda x: x.created_at)
+    
+    messages = [{"role": "system", "content": "You are a helpful Todo assistant. Use the tools provided to manage tasks. When the user names a task instead of giving its id, use the *_by_title tools directly rather than listing tasks first."}]
+    for msg in history_msgs:
+        messages.append({"role": msg.role, "content": msg.content})
 
-        # 4. Call OpenAI with Tools
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            tools=TOOLS,
-            tool_choice="auto"
-        )
-        
-        response_msg = completion.choices[0].message
-        tool_calls_log = []
+    # Release the connection while waiting on the model
+    await session.commit()
+
+    # 4. Call OpenAI with Tools
+    completion = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
+        tools=TOOLS,
+        tool_choice="auto"
+    )
+    
+    response_msg = completion.choices[0].message
+    tool_calls_log = []
+    
+    # 5. Handle Tool Calls
+    if response_msg.tool_calls:
+        messages.append(response_msg) # Add assistant's tool request to context
         
-        # 5. Handle Tool Calls
-        if response_msg.tool_calls:
-            messages.append(response_msg) # Add assistant's tool request to context
+        for tool_call in response_msg.tool_calls:
+            fn_name = tool_call.function.name
+            fn_args = json.loads(tool_call.function.arguments)
+            tool_calls_log.append({"name": fn_name, "args": fn_args})
             
-            for tool_call in response_msg.tool_calls:
-                fn_name = tool_call.function.name
-                fn_args = json.loads(tool_call.function.arguments)
-                tool_calls_log.append({"name": fn_name, "args": fn_args})
-                
-                # Execute tool
-                tool_result = execute_tool(fn_name, fn_args, user_id)
-                
-                messages.append({
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "name": fn_name,
-                    "content": json.dumps(tool_result)
-                })
+            # Execute tool
+            tool_result = await execute_tool(session, fn_name, fn_args, user_id)
             
-            # Second call to get final response
-            final_completion = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages
-            )
-            final_content = final_completion.choices[0].message.content
+            messages.append({
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "name": fn_name,
+                "content": json.dumps(tool_result)
+            })
 
-        else:
-            # Fallback for models that output XML-like tool calls in content (e.g. Nemotron)
-            content = response_msg.content or ""
-            if "<tool_call>" in content:
-                try:
-                    import re
-                    # Extract function name
-                    fn_match = re.search(r"<function=([^>]+)>", content)
-                    if fn_match:
-                        fn_name = fn_match.group(1).strip()
-                        fn_args = {}
-                        
-                        # Attempt to extract parameter if it exists
-                        param_match = re.search(r"<parameter=([^>]+)>\s*([^<]+)\s*</parameter>", content)
-                        if param_match:
-                            param_name = param_match.group(1).strip()
-                            param_value = param_match.group(2).strip()
-                            fn_args[param_name] = param_value
-                        
-                        tool_calls_log.append({"name": fn_name, "args": fn_args})
-                        
-                        # Execute tool
-                        tool_result = execute_tool(fn_name, fn_args, user_id)
-                        
-                        # Add conversational context
-                        messages.append({"role": "assistant", "content": content})
-                        messages.append({
-                            "role": "user", 
-                            "content": f"Tool execution result: {json.dumps(tool_result)}"
-                        })
-                        
-                        # Get final response
-                        final_completion = client.chat.completions.create(
-                            model=MODEL_NAME,
-                            messages=messages
-                        )
-                        final_content = final_completion.choices[0].message.content
-                    else:
-                        final_content = content
-                except Exception as e:
-                    print(f"Error parsing fallback tool call: {e}")
+        # All tool mutations of this turn commit in one transaction
+        await session.commit()
+        
+        # Second call to get final response
+        final_completion = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages
+        )
+        final_content = final_completion.choices[0].message.content
+
+    else:
+        # Fallback for models that output XML-like tool calls in content (e.g. Nemotron)
+        content = response_msg.content or ""
+        if "<tool_call>" in content:
+            try:
+                import re
+                # Extract function name
+                fn_match = re.search(r"<function=([^>]+)>", content)
+                if fn_match:
+                    fn_name = fn_match.group(1).strip()
+                    fn_args = {}
+                    
+                    # Attempt to extract parameter if it exists
+                    param_match = re.search(r"<parameter=([^>]+)>\s*([^<]+)\s*</parameter>", content)
+                    if param_match:
+                        param_name = param_match.group(1).strip()
+                        param_value = param_match.group(2).strip()
+                        fn_args[param_name] = param_value
+                    
+                    tool_calls_log.append({"name": fn_name, "args": fn_args})
+                    
+                    # Execute tool
+                    tool_result = await execute_tool(session, fn_name, fn_args, user_id)
+                    await session.commit()
+                    
+                    # Add conversational context
+                    messages.append({"role": "assistant", "content": content})
+                    messages.append({
+                        "role": "user", 
+                        "content": f"Tool execution result: {json.dumps(tool_result)}"
+                    })
+                    
+                    # Get final response
+                    final_completion = await client.chat.completions.create(
+                        model=MODEL_NAME,
+                        messages=messages
+                    )
+                    final_content = final_completion.choices[0].message.content
+                else:
                     final_content = content
-            else:
+            except Exception as e:
+                print(f"Error parsing fallback tool call: {e}")
+                await session.rollback()
                 final_content = content
+        else:
+            final_content = content
 
 
-        # 6. Add Assistant Message to History
-        asst_msg = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=final_content
-        )
-        session.add(asst_msg)
-        session.commit()
-        
-        return ChatResponse(
-            response=final_content,
-            conversation_id=conversation.id,
-            tool_calls=tool_calls_log
-        )
+    # 6. Add Assistant Message to History
+    asst_msg = Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        content=final_content
+    )
+    session.add(asst_msg)
+    await session.commit()
+    
+    return ChatResponse(
+        response=final_content,
+        conversation_id=conversation.id,
+        tool_calls=tool_calls_log
+    )
 
 @router.get("/conversations", response_model=List[Dict[str, Any]])
-async def list_conversations(current_user: User = Depends(get_current_user)):
+async def list_conversations(current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """List all conversations for the authenticated user."""
-    with Session(engine) as session:
-        statement = select(Conversation).where(Conversation.user_id == current_user.id).order_by(Conversation.created_at.desc())
-        results = session.exec(statement).all()
-        return [{"id": c.id, "title": c.title, "created_at": c.created_at} for c in results]
+    statement = (
+        select(Conversation.id, Conversation.title, Conversation.created_at)
+        .where(Conversation.user_id == current_user.id)
+        .order_by(Conversation.created_at.desc())
+    )
+    return FastJSONResponse(rows_as_dicts(await session.execute(statement)))
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[Dict[str, Any]])
-async def get_messages(conversation_id: str, current_user: User = Depends(get_current_user)):
+async def get_messages(conversation_id: str, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """Retrieve message history for a specific conversation."""
-    with Session(engine) as session:
-        # Verify ownership
-        conversation = session.get(Conversation, conversation_id)
-        if not conversation or conversation.user_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-        
-        statement = select(Message).where(Message.conversation_id == conversation_id).order_by(Message.created_at.asc())
-        results = session.exec(statement).all()
-        return [{"role": m.role, "content": m.content, "created_at": m.created_at} for m in results]
+    # Verify ownership
+    owner = (await session.exec(select(Conversation.user_id).where(Conversation.id == conversation_id))).first()
+    if owner != current_user.id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    statement = (
+        select(Message.role, Message.content, Message.created_at)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.asc())
+    )
+    return FastJSONResponse(rows_as_dicts(await session.execute(statement)))
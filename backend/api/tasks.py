@@ -1,178 +1,496 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sse_starlette.sse import EventSourceResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from config.database import engine
-from models.task import Task, TaskCreate, TaskRead, TaskUpdate
+from sqlalchemy import delete, update
+from sqlmodel import select
+from config.database import async_session, get_session
+from models.task import TagCount, Task, TaskBatchRequest, TaskBatchResult, TaskChanges, TaskCreate, TaskRead, TaskUpdate
 from models.user import User
-from core.auth import get_current_user
+from core.auth import get_current_user, get_stream_user_id, issue_stream_token
+from core.events import broker, record_delete, record_upsert
+from core.fast_json import FastJSONResponse, rows_as_dicts
+from core.outbox import enqueue
+from core.task_queries import (
+    changed_tasks_statement,
+    complete_statement,
+    cursor_fields,
+    decode_cursor,
+    encode_cursor,
+    owned_delete_statement,
+    owned_task_row_statement,
+    owned_task_statement,
+    owned_update_statement,
+    parse_fields,
+    task_columns,
+    task_list_statement,
+    task_rows_statement,
+    tombstones_statement,
+)
+from core.task_search import decode_search_cursor, encode_search_cursor, search_statement, search_terms
+from core.task_tags import sync_task_tags, tag_counts_statement, untag_statement
+from core.task_versions import (
+    bump_task_list_version,
+    decode_sync_token,
+    encode_sync_token,
+    etag_matches,
+    task_list_etag,
+    task_list_version,
+    token_expired,
+    tombstone_statement,
+)
 
 # Better Auth compliant task management router
 router = APIRouter()
 
-import httpx
+import json
 import os
 
-DAPR_PORT = os.getenv("DAPR_HTTP_PORT", 3500)
 PUBSUB_NAME = "pubsub"
 TOPIC_NAME = "task.completed"
 
-async def publish_task_completed(task_id: str, user_id: str, title: str, is_recurring: bool, pattern: str):
-    """Notify other services that a mission objective was completed."""
+# Page size when a cursor is passed without an explicit limit
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "50"))
+TASK_PAGE_MAX = int(os.getenv("TASK_PAGE_MAX", "200"))
+
+# Upper bound on operations per POST /batch
+TASK_BATCH_MAX = int(os.getenv("TASK_BATCH_MAX", "500"))
+
+# Clients may keep a copy but must revalidate it with If-None-Match
+TASK_CACHE_CONTROL = "private, no-cache"
+
+def cache_headers(etag: str) -> dict:
+    # Responses differ per signed-in user, so caches must key on the credentials
+    return {"ETag": etag, "Cache-Control": TASK_CACHE_CONTROL, "Vary": "Authorization"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+def requested_fields(fields: Optional[str]) -> Optional[List[str]]:
     try:
-        async with httpx.AsyncClient() as client:
-            url = f"http://localhost:{DAPR_PORT}/v1.0/publish/{PUBSUB_NAME}/{TOPIC_NAME}"
-            payload = {
-                "id": task_id,
-                "user_id": user_id,
-                "title": title,
-                "is_recurring": is_recurring,
-                "recurrence_pattern": pattern,
-                "completed_at": datetime.utcnow().isoformat()
-            }
-            await client.post(url, json=payload)
-    except Exception as e:
-        print(f"Dapr Signal Error: {e}")
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def completion_event(task_id: str, user_id: str, title: str, is_recurring: bool, pattern: str) -> dict:
+    return {
+        "id": task_id,
+        "user_id": user_id,
+        "title": title,
+        "is_recurring": is_recurring,
+        "recurrence_pattern": pattern,
+        "completed_at": datetime.utcnow().isoformat()
+    }
+
+async def enqueue_completions(session: AsyncSession, tasks: List[Task]):
+    """Queue task.completed events in the outbox, committed with the completions."""
+    events = [
+        completion_event(task.id, task.user_id, task.title, task.is_recurring, task.recurrence_pattern)
+        for task in tasks
+    ]
+    await enqueue(session, PUBSUB_NAME, TOPIC_NAME, events)
 
 @router.get("/", response_model=List[TaskRead])
-def read_tasks(
+async def read_tasks(
     status: Optional[str] = "all",
     sort: Optional[str] = "created_at",
-    current_user: User = Depends(get_current_user)
+    tag: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=TASK_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
 ):
     """
     Enhanced task retrieval with filtering and sorting for Phase 5.
+    `tag` keeps only tasks carrying that tag (case-insensitive).
+    `q` full-text searches titles, descriptions and tags instead: results
+    come best match first, a page at a time, and `sort` is ignored. A `q`
+    without any words matches nothing.
+    Pass `limit` (and then the `X-Next-Cursor` response header as `cursor`)
+    to page through the list; without either the full list is returned.
+    `fields=id,title,...` selects and returns only those TaskRead fields.
+    Answers a matching If-None-Match with 304 before running the list query.
+    Rows are read as plain column tuples and serialized without the ORM or
+    TaskRead validation.
+    """
+    selected = requested_fields(fields)
+    etag = task_list_etag(current_user.id, await task_list_version(session, current_user.id))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    headers = cache_headers(etag)
+
+    if q is not None:
+        return await search_tasks(session, current_user.id, q, status, tag, limit, cursor, selected, headers)
+
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        limit = limit or TASK_PAGE_SIZE
+
+    if limit is None:
+        statement = task_rows_statement(current_user.id, status, sort, columns=task_columns(selected), tag=tag)
+        return FastJSONResponse(rows_as_dicts(await session.execute(statement)), headers=headers)
+
+    # One extra row tells us whether another page exists; the cursor's sort
+    # keys are selected even when the fieldset leaves them out
+    columns = task_columns(selected, extra=cursor_fields(sort))
+    statement = task_rows_statement(
+        current_user.id, status, sort, after=after, limit=limit + 1, columns=columns, tag=tag
+    )
+    rows = (await session.execute(statement)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1], sort)
+    page = [row._asdict() for row in rows]
+    if selected is not None and len(columns) > len(selected):
+        page = [{name: item[name] for name in selected} for item in page]
+    return FastJSONResponse(page, headers=headers)
+
+async def search_tasks(session, user_id, q, status, tag, limit, cursor, selected, headers):
+    """Ranked page of read_tasks' `q` search; X-Next-Cursor carries (rank, id)."""
+    terms = search_terms(q)
+    if not terms:
+        return FastJSONResponse([], headers=headers)
+    after = None
+    if cursor:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    limit = limit or TASK_PAGE_SIZE
+
+    statement = search_statement(
+        session.bind.dialect.name, user_id, terms, status, tag,
+        after=after, limit=limit + 1, columns=task_columns(selected, extra=("id",))
+    )
+    rows = (await session.execute(statement)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_search_cursor(rows[-1])
+    names = selected or list(TaskRead.model_fields)
+    return FastJSONResponse([{name: getattr(row, name) for name in names} for row in rows], headers=headers)
+
+@router.post("/batch", response_model=List[TaskBatchResult])
+async def batch_tasks(batch: TaskBatchRequest, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
+    """
+    Applies create/update/complete/delete operations in one transaction.
+    Operations are grouped by kind and each group runs as one set-based
+    statement scoped to the current user; results come back in request order.
+    """
+    operations = batch.operations
+    if len(operations) > TASK_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {TASK_BATCH_MAX} operations")
+
+    results: List[Optional[TaskBatchResult]] = [None] * len(operations)
+    creates, updates, completes, deletes = [], {}, {}, {}
+    seen = set()
+    for index, op in enumerate(operations):
+        if op.op == "create":
+            if op.task is None:
+                results[index] = TaskBatchResult(index=index, op=op.op, status="invalid")
+                continue
+            task = Task(**op.task.dict(exclude={"created_at", "updated_at", "completed_at"}), user_id=current_user.id)
+            creates.append((index, task))
+            continue
+        # Each existing task may appear once, so group order never matters
+        if not op.id or op.id in seen or (op.op == "update" and op.changes is None):
+            results[index] = TaskBatchResult(index=index, op=op.op, id=op.id, status="invalid")
+            continue
+        seen.add(op.id)
+        {"update": updates, "complete": completes, "delete": deletes}[op.op][op.id] = index
+
+    def owned(ids):
+        return (Task.user_id == current_user.id) & Task.id.in_(list(ids))
+
+    try:
+        if creates or updates or completes or deletes:
+            version = await bump_task_list_version(session, current_user.id)
+
+        for _, task in creates:
+            task.version = version
+        session.add_all([task for _, task in creates])
+        await session.flush()
+        tagged = {task.id: task.tags for _, task in creates if task.tags}
+        await sync_task_tags(session, current_user.id, tagged, new=True)
+
+        updated = {}
+        if updates:
+            existing = set((await session.exec(select(Task.id).where(owned(updates)))).all())
+            changed = [
+                {"id": task_id, "version": version, **operations[index].changes.dict(exclude_unset=True)}
+                for task_id, index in updates.items()
+                if task_id in existing and operations[index].changes.dict(exclude_unset=True)
+            ]
+            # Bulk UPDATE by primary key, batched by the set of changed columns
+            if changed:
+                await session.execute(update(Task), changed)
+                await sync_task_tags(session, current_user.id, {row["id"]: row["tags"] for row in changed if "tags" in row})
+            statement = select(Task).where(owned(existing)).execution_options(populate_existing=True)
+            updated = {task.id: task for task in (await session.exec(statement)).all()}
+
+        completed = {}
+        if completes:
+            statement = (
+                update(Task)
+                .where(owned(completes))
+                .values(status="completed", completed_at=datetime.utcnow(), version=version)
+                .returning(Task)
+            )
+            completed = {task.id: task for task in (await session.execute(statement)).scalars().all()}
+
+        deleted = set()
+        if deletes:
+            await session.execute(untag_statement(current_user.id, list(deletes)))
+            statement = delete(Task).where(owned(deletes)).returning(Task.id)
+            deleted = set((await session.execute(statement)).scalars().all())
+            if deleted:
+                await session.execute(tombstone_statement(current_user.id, list(deleted), version))
+
+        for task in [task for _, task in creates] + list(updated.values()) + list(completed.values()):
+            record_upsert(session, task)
+        for task_id in deleted:
+            record_delete(session, current_user.id, task_id, version)
+        await enqueue_completions(session, list(completed.values()))
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    for index, task in creates:
+        results[index] = TaskBatchResult(index=index, op="create", id=task.id, status="created", task=TaskRead.model_validate(task))
+    for found, group, done in ((updated, updates, "updated"), (completed, completes, "completed")):
+        for task_id, index in group.items():
+            task = found.get(task_id)
+            results[index] = TaskBatchResult(
+                index=index, op=operations[index].op, id=task_id,
+                status=done if task else "not_found", task=TaskRead.model_validate(task) if task else None
+            )
+    for task_id, index in deletes.items():
+        results[index] = TaskBatchResult(
+            index=index, op="delete", id=task_id, status="deleted" if task_id in deleted else "not_found"
+        )
+
+    return results
+
+@router.get("/changes", response_model=TaskChanges)
+async def read_task_changes(
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Delta sync: tasks created or changed and ids deleted since `since`, plus
+    the token for the next call. Without a token (or with one older than the
+    tombstone retention) every task is returned and `reset` is set.
+    """
+    since_version = 0
+    reset = True
+    if since:
+        try:
+            since_version, issued_at = decode_sync_token(since)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        reset = token_expired(issued_at)
+
+    current = await task_list_version(session, current_user.id)
+    if reset:
+        upserts = (await session.exec(task_list_statement(current_user.id))).all()
+        deleted = []
+    else:
+        upserts = (await session.exec(changed_tasks_statement(current_user.id, since_version, current))).all()
+        deleted = (await session.exec(tombstones_statement(current_user.id, since_version, current))).all()
+
+    return TaskChanges(
+        upserts=[TaskRead.model_validate(task) for task in upserts],
+        deleted=deleted,
+        token=encode_sync_token(current),
+        reset=reset
+    )
+
+@router.post("/events/token")
+async def create_stream_token(current_user: User = Depends(get_current_user)):
+    """
+    Short-lived token for opening /events from a browser EventSource, which
+    can't send an Authorization header: pass it as `?token=`.
     """
-    with Session(engine) as session:
-        statement = select(Task).where(Task.user_id == current_user.id)
-        
-        if status and status != "all":
-            statement = statement.where(Task.status == status)
-            
-        if sort == "priority":
-            # high -> 0, medium -> 1, low -> 2 for ascending sort
-            from sqlalchemy import case
-            statement = statement.order_by(case(
-                (Task.priority == "high", 0),
-                (Task.priority == "medium", 1),
-                (Task.priority == "low", 2)
-            ))
-        elif sort == "due_date":
-            statement = statement.order_by(Task.due_date.asc())
-        else: # default created_at
-            statement = statement.order_by(Task.created_at.desc())
-            
-        tasks = session.exec(statement).all()
-        return tasks
+    token, expires_at = issue_stream_token(current_user.id)
+    return {"token": token, "expires_at": expires_at}
+
+@router.get("/events")
+async def stream_task_events(user_id: str = Depends(get_stream_user_id), session: AsyncSession = Depends(get_session)):
+    """
+    Server-sent events for the user's task changes as they commit: `sync`
+    first (a token for /changes), then `upsert` and `delete`, and finally
+    `resync` if the connection fell behind and must catch up via /changes.
+    Authenticates with `?token=` from POST /events/token or a bearer header.
+    """
+    # Don't hold a pooled connection for the life of the stream
+    await session.close()
+
+    async def stream():
+        with broker.subscribe(user_id) as subscription:
+            # Read the token after subscribing so no commit falls in between
+            async with async_session() as token_session:
+                token = encode_sync_token(await task_list_version(token_session, user_id))
+            yield {"event": "sync", "data": json.dumps({"token": token})}
+            while True:
+                item = await subscription.queue.get()
+                yield {"event": item["type"], "data": json.dumps(item)}
+                if item["type"] == "resync":
+                    return
+
+    return EventSourceResponse(stream())
+
+@router.get("/tags", response_model=List[TagCount])
+async def read_tag_counts(
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    The user's tags with the number of tasks carrying each, most used first.
+    """
+    etag = task_list_etag(current_user.id, await task_list_version(session, current_user.id), "tags")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    rows = await session.execute(tag_counts_statement(current_user.id))
+    return FastJSONResponse(rows_as_dicts(rows), headers=cache_headers(etag))
 
 @router.get("/{task_id}", response_model=TaskRead)
-def read_task(task_id: str, current_user: User = Depends(get_current_user)):
+async def read_task(
+    task_id: str,
+    response: Response,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session)
+):
     """
     Better Auth compliant endpoint to read a specific user's task
     Ensures user can only access their own task
     """
-    with Session(engine) as session:
-        statement = select(Task).where(Task.id == task_id, Task.user_id == current_user.id)
-        task = session.exec(statement).first()
+    selected = requested_fields(fields)
+    etag = task_list_etag(current_user.id, await task_list_version(session, current_user.id), f"task-{task_id}")
+    if etag_matches(if_none_match, etag):
+        # Only the owner may learn that the task exists, even as a 304
+        statement = owned_task_row_statement(current_user.id, task_id, [Task.id])
+        if not (await session.execute(statement)).first():
+            raise HTTPException(status_code=404, detail="Task not found")
+        return not_modified(etag)
 
-        if not task:
+    if selected is not None:
+        statement = owned_task_row_statement(current_user.id, task_id, task_columns(selected))
+        row = (await session.execute(statement)).first()
+        if not row:
             raise HTTPException(status_code=404, detail="Task not found")
+        return FastJSONResponse(row._asdict(), headers=cache_headers(etag))
 
-        return task
+    statement = owned_task_statement(current_user.id, task_id)
+    task = (await session.exec(statement)).first()
+
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    response.headers.update(cache_headers(etag))
+    return task
 
 @router.post("/", response_model=TaskRead)
-def create_task(task: TaskCreate, current_user: User = Depends(get_current_user)):
+async def create_task(task: TaskCreate, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
     Enhanced task creation for Phase 5 supporting priorities, tags, and recurrence.
     """
-    with Session(engine) as session:
-        db_task = Task(
-            title=task.title,
-            description=task.description,
-            status=task.status,
-            priority=task.priority,
-            tags=task.tags,
-            due_date=task.due_date,
-            is_recurring=task.is_recurring,
-            recurrence_pattern=task.recurrence_pattern,
-            user_id=current_user.id
-        )
+    version = await bump_task_list_version(session, current_user.id)
+    db_task = Task(
+        title=task.title,
+        description=task.description,
+        status=task.status,
+        priority=task.priority,
+        tags=task.tags,
+        due_date=task.due_date,
+        is_recurring=task.is_recurring,
+        recurrence_pattern=task.recurrence_pattern,
+        user_id=current_user.id,
+        version=version
+    )
 
-        session.add(db_task)
-        session.commit()
-        session.refresh(db_task)
+    session.add(db_task)
+    if db_task.tags:
+        await sync_task_tags(session, current_user.id, {db_task.id: db_task.tags}, new=True)
+    record_upsert(session, db_task)
+    await session.commit()
+    await session.refresh(db_task)
 
-        return db_task
+    return db_task
 
 @router.put("/{task_id}", response_model=TaskRead)
-def update_task(task_id: str, task_update: TaskUpdate, current_user: User = Depends(get_current_user)):
+async def update_task(task_id: str, task_update: TaskUpdate, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
     Better Auth compliant endpoint to update a user's task
     Ensures user can only update their own task
     """
-    with Session(engine) as session:
-        statement = select(Task).where(Task.id == task_id, Task.user_id == current_user.id)
-        db_task = session.exec(statement).first()
+    # Update task with provided values in one UPDATE ... RETURNING
+    update_data = task_update.dict(exclude_unset=True)
+    if update_data:
+        update_data["version"] = await bump_task_list_version(session, current_user.id)
+        statement = owned_update_statement(current_user.id, task_id, update_data)
+    else:
+        statement = owned_task_statement(current_user.id, task_id)
+    db_task = (await session.execute(statement)).scalars().first()
 
-        if not db_task:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        # Update task with provided values
-        update_data = task_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_task, field, value)
+    if not db_task:
+        raise HTTPException(status_code=404, detail="Task not found")
 
-        session.add(db_task)
-        session.commit()
-        session.refresh(db_task)
+    if "tags" in update_data:
+        await sync_task_tags(session, current_user.id, {db_task.id: db_task.tags})
+    if update_data:
+        record_upsert(session, db_task)
+    await session.commit()
 
-        return db_task
+    return db_task
 
 @router.delete("/{task_id}")
-def delete_task(task_id: str, current_user: User = Depends(get_current_user)):
+async def delete_task(task_id: str, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
     Better Auth compliant endpoint to delete a user's task
     Ensures user can only delete their own task
     """
-    with Session(engine) as session:
-        statement = select(Task).where(Task.id == task_id, Task.user_id == current_user.id)
-        db_task = session.exec(statement).first()
+    version = await bump_task_list_version(session, current_user.id)
+    await session.execute(untag_statement(current_user.id, [task_id]))
+    statement = owned_delete_statement(current_user.id, task_id)
+    deleted = (await session.execute(statement)).first()
 
-        if not db_task:
-            raise HTTPException(status_code=404, detail="Task not found")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Task not found")
 
-        session.delete(db_task)
-        session.commit()
+    await session.execute(tombstone_statement(current_user.id, [task_id], version))
+    record_delete(session, current_user.id, task_id, version)
+    await session.commit()
 
-        return {"message": "Task deleted successfully"}
+    return {"message": "Task deleted successfully"}
 
 @router.patch("/{task_id}/complete")
-async def complete_task(task_id: str, current_user: User = Depends(get_current_user)):
+async def complete_task(task_id: str, current_user: User = Depends(get_current_user), session: AsyncSession = Depends(get_session)):
     """
     Better Auth compliant endpoint to mark a user's task as complete
     Ensures user can only complete their own task
     """
-    with Session(engine) as session:
-        statement = select(Task).where(Task.id == task_id, Task.user_id == current_user.id)
-        db_task = session.exec(statement).first()
+    version = await bump_task_list_version(session, current_user.id)
+    statement = complete_statement(current_user.id, task_id, version)
+    db_task = (await session.execute(statement)).scalars().first()
 
-        if not db_task:
-            raise HTTPException(status_code=404, detail="Task not found")
+    if not db_task:
+        raise HTTPException(status_code=404, detail="Task not found")
 
-        db_task.status = "completed"
-        db_task.completed_at = datetime.utcnow()
-
-        session.add(db_task)
-        session.commit()
-        session.refresh(db_task)
-
-        # Trigger EDA event
-        await publish_task_completed(
-            task_id=db_task.id,
-            user_id=db_task.user_id,
-            title=db_task.title,
-            is_recurring=db_task.is_recurring,
-            pattern=db_task.recurrence_pattern
-        )
+    record_upsert(session, db_task)
+    # Published by the outbox relay once this commits
+    await enqueue_completions(session, [db_task])
+    await session.commit()
 
-        return {"message": "Task marked as completed", "task": db_task}
\ No newline at end of file
+    return {"message": "Task marked as completed", "task": db_task}
\ No newline at end of file
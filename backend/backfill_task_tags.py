@@ -0,0 +1,67 @@
+"""
+Backfills the tag and task_tag tables from existing Task.tags strings.
+
+Walks tasks in primary-key order, one batch per transaction, and rebuilds
+each batch's links, so it is safe to re-run and to stop part-way. New writes
+keep the tables in step themselves (see core/task_tags.py); run this once
+after the tables are migrated.
+
+    python backfill_task_tags.py --batch-size 1000
+"""
+import argparse
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert
+from sqlmodel import select
+
+from config.database import engine
+from core.task_tags import link_rows, parse_tags, tag_ids_statement, tag_upsert_statement
+from models.user import User  # noqa: F401
+from models.task import Task, TaskTag
+from models.conversation import Conversation  # noqa: F401
+from models.message import Message  # noqa: F401
+from models.auth import Session as AuthSession  # noqa: F401
+from models.outbox import OutboxEvent  # noqa: F401
+
+load_dotenv()
+
+
+def backfill_batch(conn, after: str, batch_size: int):
+    """Rebuilds links for the next batch of tagged tasks; returns (last id, tasks seen)."""
+    rows = conn.execute(
+        select(Task.id, Task.user_id, Task.tags)
+        .where(Task.id > after, Task.tags != None, Task.tags != "")  # noqa: E711
+        .order_by(Task.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return None, 0
+
+    links = {row.id: (row.user_id, parse_tags(row.tags)) for row in rows}
+    pairs = sorted({(user_id, name) for user_id, names in links.values() for name in names})
+    conn.execute(delete(TaskTag).where(TaskTag.task_id.in_(list(links))))
+    if pairs:
+        conn.execute(tag_upsert_statement(conn.dialect.name, pairs))
+        tag_ids = {(row.user_id, row.name): row.id for row in conn.execute(tag_ids_statement(pairs))}
+        conn.execute(insert(TaskTag), link_rows(links, tag_ids))
+    return rows[-1].id, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    args = parser.parse_args()
+
+    after, total = "", 0
+    while True:
+        with engine.begin() as conn:
+            after, seen = backfill_batch(conn, after, args.batch_size)
+        if not seen:
+            break
+        total += seen
+        print(f"Backfilled tags for {total} tasks (last id {after}).")
+    print(f"Tag backfill finished: {total} tasks.")
+
+
+if __name__ == "__main__":
+    main()
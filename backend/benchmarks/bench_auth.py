@@ -0,0 +1,104 @@
+"""
+Auth latency benchmark: legacy two-query session lookup vs single joined query.
+
+Seeds a scratch database with N Better Auth sessions (1M by default), then
+resolves random tokens through both paths, bypassing the in-process cache.
+
+    DATABASE_URL=postgresql://.../scratch python -m benchmarks.bench_auth --sessions 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+from sqlmodel import Session, SQLModel, select
+
+from config.database import engine
+from core.auth import resolved_session_from_row, session_lookup_statement
+from models.user import User
+from models.task import Task  # noqa: F401
+from models.conversation import Conversation  # noqa: F401
+from models.message import Message  # noqa: F401
+from models.auth import Session as AuthSession
+from models.outbox import OutboxEvent  # noqa: F401
+
+BENCH_USER_ID = "bench-user"
+BATCH_SIZE = 10_000
+
+
+def seed(total: int):
+    SQLModel.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        if not session.get(User, BENCH_USER_ID):
+            session.add(User(id=BENCH_USER_ID, name="Bench", email="bench@example.com"))
+            session.commit()
+        existing = session.exec(
+            select(func.count()).select_from(AuthSession).where(AuthSession.user_id == BENCH_USER_ID)
+        ).one()
+
+    if existing >= total:
+        print(f"Reusing {existing} seeded sessions")
+        return
+
+    print(f"Seeding {total - existing} sessions...")
+    expires = datetime.utcnow() + timedelta(days=7)
+    with engine.begin() as conn:
+        for start in range(existing, total, BATCH_SIZE):
+            rows = [
+                {
+                    "id": f"bench-session-{i}",
+                    "token": f"bench-token-{i}",
+                    "user_id": BENCH_USER_ID,
+                    "expires_at": expires,
+                }
+                for i in range(start, min(start + BATCH_SIZE, total))
+            ]
+            conn.execute(insert(AuthSession.__table__), rows)
+
+
+def legacy_resolve(session: Session, token: str):
+    """The pre-join lookup: full AuthSession entity, then User by id."""
+    db_session = session.exec(select(AuthSession).where(AuthSession.token == token)).first()
+    if not db_session:
+        return None
+    uid = db_session.user_id or db_session.userId
+    user = session.exec(select(User).where(User.id == uid)).first()
+    return user, db_session.expires_at or db_session.expiresAt
+
+
+def joined_resolve(session: Session, token: str):
+    """The auth path: one joined, column-projected statement."""
+    row = session.exec(session_lookup_statement(token)).first()
+    return resolved_session_from_row(row) if row else None
+
+
+def measure(label: str, resolver, tokens):
+    timings = []
+    with Session(engine) as session:
+        for token in tokens:
+            start = time.perf_counter()
+            assert resolver(session, token) is not None
+            timings.append((time.perf_counter() - start) * 1000)
+            session.expunge_all()
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<8} mean={statistics.mean(timings):.3f}ms p50={statistics.median(timings):.3f}ms p95={p95:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    args = parser.parse_args()
+
+    seed(args.sessions)
+    tokens = [f"bench-token-{random.randrange(args.sessions)}" for _ in range(args.lookups)]
+
+    measure("legacy", legacy_resolve, tokens)
+    measure("joined", joined_resolve, tokens)
+
+
+if __name__ == "__main__":
+    main()
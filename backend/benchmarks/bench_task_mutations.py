@@ -0,0 +1,153 @@
+"""
+Task mutation benchmark: select/mutate/commit/refresh vs UPDATE/DELETE ... RETURNING.
+
+Runs the same update, complete and delete workload through both paths and
+reports statements sent to the database (round trips) and latency per mutation.
+Statement counts exclude COMMIT, which both paths send once per mutation.
+
+    DATABASE_URL=postgresql://.../scratch python -m benchmarks.bench_task_mutations --mutations 2000
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from sqlalchemy import event, insert
+from sqlmodel import Session, SQLModel
+
+from config.database import engine
+from core.task_queries import (
+    complete_statement,
+    owned_delete_statement,
+    owned_task_statement,
+    owned_update_statement,
+)
+from core.task_versions import bump_version_statement
+from models.user import User
+from models.task import Task
+from models.conversation import Conversation  # noqa: F401
+from models.message import Message  # noqa: F401
+from models.auth import Session as AuthSession  # noqa: F401
+from models.outbox import OutboxEvent  # noqa: F401
+
+BENCH_USER_ID = "bench-user"
+
+statements_sent = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements_sent
+    statements_sent += 1
+
+
+def seed(prefix: str, total: int) -> list:
+    with Session(engine) as session:
+        if not session.get(User, BENCH_USER_ID):
+            session.add(User(id=BENCH_USER_ID, name="Bench", email="bench@example.com"))
+            session.commit()
+    ids = [f"{prefix}-{i}" for i in range(total)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Task.__table__),
+            [
+                {
+                    "id": task_id,
+                    "user_id": BENCH_USER_ID,
+                    "title": f"Bench task {task_id}",
+                    "status": "pending",
+                    "priority": "medium",
+                    "is_recurring": False,
+                    "created_at": datetime.utcnow(),
+                }
+                for task_id in ids
+            ],
+        )
+    return ids
+
+
+def legacy_update(session: Session, task_id: str):
+    task = session.exec(owned_task_statement(BENCH_USER_ID, task_id)).first()
+    task.title = f"{task.title}!"
+    session.add(task)
+    session.commit()
+    session.refresh(task)
+
+
+def legacy_complete(session: Session, task_id: str):
+    task = session.exec(owned_task_statement(BENCH_USER_ID, task_id)).first()
+    task.status = "completed"
+    task.completed_at = datetime.utcnow()
+    session.add(task)
+    session.commit()
+    session.refresh(task)
+
+
+def legacy_delete(session: Session, task_id: str):
+    task = session.exec(owned_task_statement(BENCH_USER_ID, task_id)).first()
+    session.delete(task)
+    session.commit()
+
+
+def returning_update(session: Session, task_id: str):
+    statement = owned_update_statement(BENCH_USER_ID, task_id, {"title": f"Bench task {task_id}!"})
+    assert session.execute(statement).scalars().first() is not None
+    session.commit()
+
+
+def returning_complete(session: Session, task_id: str):
+    # Completions are stamped with the task-list version bumped in the same transaction
+    version = session.execute(bump_version_statement(engine.dialect.name, BENCH_USER_ID)).scalar_one()
+    assert session.execute(complete_statement(BENCH_USER_ID, task_id, version)).scalars().first() is not None
+    session.commit()
+
+
+def returning_delete(session: Session, task_id: str):
+    assert session.execute(owned_delete_statement(BENCH_USER_ID, task_id)).first() is not None
+    session.commit()
+
+
+def measure(label: str, mutation, ids):
+    global statements_sent
+    timings = []
+    with Session(engine, expire_on_commit=False) as session:
+        statements_sent = 0
+        for task_id in ids:
+            start = time.perf_counter()
+            mutation(session, task_id)
+            timings.append((time.perf_counter() - start) * 1000)
+            session.expunge_all()
+        trips = statements_sent / len(ids)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{label:<20} statements/op={trips:.2f} "
+        f"mean={statistics.mean(timings):.3f}ms p50={statistics.median(timings):.3f}ms p95={p95:.3f}ms"
+    )
+
+
+def cleanup(prefix: str):
+    with engine.begin() as conn:
+        conn.execute(Task.__table__.delete().where(Task.id.like(f"{prefix}-%")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mutations", type=int, default=2_000)
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(bind=engine)
+    for path, update_fn, complete_fn, delete_fn in (
+        ("legacy", legacy_update, legacy_complete, legacy_delete),
+        ("returning", returning_update, returning_complete, returning_delete),
+    ):
+        prefix = f"bench-{path}"
+        cleanup(prefix)
+        ids = seed(prefix, args.mutations)
+        measure(f"{path} update", update_fn, ids)
+        measure(f"{path} complete", complete_fn, ids)
+        measure(f"{path} delete", delete_fn, ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Task list read benchmark: ORM entities + TaskRead validation vs column rows + fast JSON.
+
+Seeds one user with N tasks (10k by default) and serializes their full list
+repeatedly through both paths, reporting lists per second and time per list.
+
+    DATABASE_URL=postgresql://.../scratch python -m benchmarks.bench_task_reads --tasks 10000
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, insert
+from sqlmodel import Session, SQLModel, select
+
+from config.database import engine
+from core.fast_json import dumps, rows_as_dicts
+from core.task_queries import task_list_statement, task_rows_statement
+from models.user import User
+from models.task import Task, TaskRead
+from models.conversation import Conversation  # noqa: F401
+from models.message import Message  # noqa: F401
+from models.auth import Session as AuthSession  # noqa: F401
+from models.outbox import OutboxEvent  # noqa: F401
+
+BENCH_USER_ID = "bench-user"
+BATCH_SIZE = 5_000
+
+
+def seed(total: int):
+    SQLModel.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        if not session.get(User, BENCH_USER_ID):
+            session.add(User(id=BENCH_USER_ID, name="Bench", email="bench@example.com"))
+            session.commit()
+        existing = session.exec(
+            select(func.count()).select_from(Task).where(Task.user_id == BENCH_USER_ID)
+        ).one()
+
+    if existing >= total:
+        print(f"Reusing {existing} seeded tasks")
+        return
+
+    print(f"Seeding {total - existing} tasks...")
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(existing, total, BATCH_SIZE):
+            rows = [
+                {
+                    "id": f"bench-task-{i}",
+                    "user_id": BENCH_USER_ID,
+                    "title": f"Bench task {i}",
+                    "description": "x" * 200,
+                    "status": "pending" if i % 3 else "completed",
+                    "priority": ("low", "medium", "high")[i % 3],
+                    "tags": "bench,load",
+                    "due_date": now + timedelta(hours=i),
+                    "is_recurring": False,
+                    "created_at": now - timedelta(seconds=i),
+                    "updated_at": now,
+                    "version": 1,
+                }
+                for i in range(start, min(start + BATCH_SIZE, total))
+            ]
+            conn.execute(insert(Task.__table__), rows)
+
+
+def orm_list(session: Session) -> bytes:
+    """The previous read path: entities, TaskRead validation, jsonable_encoder."""
+    tasks = session.exec(task_list_statement(BENCH_USER_ID)).all()
+    payload = [TaskRead.model_validate(task) for task in tasks]
+    body = json.dumps(jsonable_encoder(payload)).encode()
+    session.expunge_all()
+    return body
+
+
+def rows_list(session: Session) -> bytes:
+    """The fast path: column tuples straight into the JSON encoder."""
+    return dumps(rows_as_dicts(session.execute(task_rows_statement(BENCH_USER_ID))))
+
+
+def measure(label: str, reader, iterations: int):
+    timings = []
+    with Session(engine) as session:
+        size = len(reader(session))  # warm up
+        for _ in range(iterations):
+            start = time.perf_counter()
+            reader(session)
+            timings.append((time.perf_counter() - start) * 1000)
+    total = sum(timings) / 1000
+    print(
+        f"{label:<5} lists/s={iterations / total:.1f} mean={statistics.mean(timings):.1f}ms "
+        f"p50={statistics.median(timings):.1f}ms bytes={size}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    seed(args.tasks)
+    measure("orm", orm_list, args.iterations)
+    measure("rows", rows_list, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Task search benchmark: full list + client-side filter vs ranked server-side search.
+
+Seeds one user with N tasks (100k by default) built from a small vocabulary,
+applies the schema (tsvector + GIN on Postgres, FTS5 on SQLite) and runs the
+same queries through both paths, reporting latency per search and matches.
+
+    DATABASE_URL=postgresql://.../scratch python -m benchmarks.bench_task_search --tasks 100000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+from sqlmodel import Session, select
+
+from config.database import engine
+from core.task_queries import task_rows_statement
+from core.task_search import search_statement, search_terms
+from migrate_db import migrate
+from models.user import User
+from models.task import Task
+from models.conversation import Conversation  # noqa: F401
+from models.message import Message  # noqa: F401
+from models.auth import Session as AuthSession  # noqa: F401
+from models.outbox import OutboxEvent  # noqa: F401
+
+BENCH_USER_ID = "bench-search-user"
+BATCH_SIZE = 5_000
+PAGE_SIZE = 50
+
+WORDS = (
+    "groceries invoice dentist report deploy review budget flight laundry meeting "
+    "garden taxes backup payroll renew insurance plumber birthday sprint migrate"
+).split()
+QUERIES = ["groceries", "dentist appointment", "quarterly report", "renew insur", "deploy backup", "plumb"]
+
+
+def seed(total: int):
+    migrate()
+    with Session(engine) as session:
+        if not session.get(User, BENCH_USER_ID):
+            session.add(User(id=BENCH_USER_ID, name="Bench", email="bench-search@example.com"))
+            session.commit()
+        existing = session.exec(
+            select(func.count()).select_from(Task).where(Task.user_id == BENCH_USER_ID)
+        ).one()
+
+    if existing >= total:
+        print(f"Reusing {existing} seeded tasks")
+        return
+
+    print(f"Seeding {total - existing} tasks...")
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(existing, total, BATCH_SIZE):
+            rows = [
+                {
+                    "id": f"bench-search-{i}",
+                    "user_id": BENCH_USER_ID,
+                    "title": " ".join(rng.sample(WORDS, 3)).capitalize(),
+                    "description": " ".join(rng.sample(WORDS, 8)),
+                    "status": "pending",
+                    "priority": "medium",
+                    "is_recurring": False,
+                    "created_at": now - timedelta(seconds=i),
+                    "updated_at": now,
+                    "version": 1,
+                }
+                for i in range(start, min(start + BATCH_SIZE, total))
+            ]
+            conn.execute(insert(Task.__table__), rows)
+
+
+def client_filter(session: Session, query: str) -> int:
+    """The previous path: download every task, substring-match titles in the client."""
+    rows = session.execute(task_rows_statement(BENCH_USER_ID)).all()
+    needle = query.lower()
+    return len([row for row in rows if needle in row.title.lower()][:PAGE_SIZE])
+
+
+def server_search(session: Session, query: str) -> int:
+    """The new path: one ranked page from the full-text index."""
+    statement = search_statement(
+        engine.dialect.name, BENCH_USER_ID, search_terms(query), limit=PAGE_SIZE + 1
+    )
+    return len(session.execute(statement).all()[:PAGE_SIZE])
+
+
+def measure(label: str, searcher, iterations: int):
+    timings = []
+    matches = {}
+    with Session(engine) as session:
+        for query in QUERIES:
+            searcher(session, query)  # warm up
+        for _ in range(iterations):
+            for query in QUERIES:
+                start = time.perf_counter()
+                matches[query] = searcher(session, query)
+                timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{label:<7} mean={statistics.mean(timings):.2f}ms p50={statistics.median(timings):.2f}ms "
+        f"p95={p95:.2f}ms matches/page={matches}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    seed(args.tasks)
+    measure("client", client_filter, args.iterations)
+    measure("search", server_search, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+EXPLAIN-based check that every hot endpoint query is served by an index.
+
+    python check_query_plans.py
+
+Sequential scans are disabled for the check on Postgres so that small dev
+tables still report whether an index *can* serve each query. Exits non-zero
+if any plan falls back to a full table scan.
+"""
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlmodel import select
+
+from config.database import engine
+from core.task_queries import changed_tasks_statement, owned_task_statement, task_list_statement, tombstones_statement
+from core.task_tags import tag_counts_statement
+from models.user import User  # noqa: F401
+from models.task import Task
+from models.conversation import Conversation
+from models.message import Message
+from models.auth import Session as AuthSession
+from models.outbox import OutboxEvent  # noqa: F401
+
+SAMPLE_USER = "plan-check-user"
+SAMPLE_ID = "plan-check-id"
+
+
+def hot_queries():
+    now = datetime.utcnow()
+    queries = {
+        "GET /api/tasks/{id}": owned_task_statement(SAMPLE_USER, SAMPLE_ID),
+        "GET /api/chat/conversations": select(Conversation)
+        .where(Conversation.user_id == SAMPLE_USER)
+        .order_by(Conversation.created_at.desc()),
+        "GET /api/chat/conversations/{id}/messages": select(Message)
+        .where(Message.conversation_id == SAMPLE_ID)
+        .order_by(Message.created_at.asc()),
+        "POST /api/chat (history)": select(Message)
+        .where(Message.conversation_id == SAMPLE_ID)
+        .order_by(Message.created_at.desc())
+        .limit(10),
+        "GET /api/tasks/changes (tasks)": changed_tasks_statement(SAMPLE_USER, 10, 20),
+        "GET /api/tasks/changes (tombstones)": tombstones_statement(SAMPLE_USER, 10, 20),
+        "GET /api/tasks?tag=...": task_list_statement(SAMPLE_USER, tag="work"),
+        "GET /api/tasks/tags": tag_counts_statement(SAMPLE_USER),
+        "auth session lookup": select(AuthSession).where(AuthSession.token == SAMPLE_ID),
+        "notification reminder scan": select(Task).where(
+            Task.due_date != None,  # noqa: E711
+            Task.due_date > now,
+            Task.due_date <= now + timedelta(hours=24),
+            Task.status == "pending",
+        ),
+    }
+    for status in ("all", "pending"):
+        for sort, after in (
+            ("created_at", [now, SAMPLE_ID]),
+            ("due_date", [now, SAMPLE_ID]),
+            ("priority", [1, now, SAMPLE_ID]),
+        ):
+            queries[f"GET /api/tasks?status={status}&sort={sort}"] = task_list_statement(SAMPLE_USER, status, sort)
+            queries[f"GET /api/tasks?status={status}&sort={sort}&cursor=..."] = task_list_statement(
+                SAMPLE_USER, status, sort, after=after, limit=51
+            )
+    return queries
+
+
+def explain(conn, statement) -> str:
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return "\n".join(row[-1] for row in rows)
+    rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+    return "\n".join(row[0] for row in rows)
+
+
+def uses_index(dialect: str, plan: str) -> bool:
+    if dialect == "sqlite":
+        # "SCAN task" without an index is a full table scan
+        return all("USING" in line for line in plan.splitlines() if line.startswith(("SCAN", "SEARCH")))
+    return "Seq Scan" not in plan and "Index" in plan
+
+
+def main() -> int:
+    failures = 0
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+        for name, statement in hot_queries().items():
+            plan = explain(conn, statement)
+            ok = uses_index(conn.dialect.name, plan)
+            failures += not ok
+            print(f"[{'OK' if ok else 'FAIL'}] {name}")
+            if not ok:
+                print("    " + plan.replace("\n", "\n    "))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,22 @@
-from sqlalchemy import create_engine
-from sqlalchemy.pool import QueuePool
-from sqlmodel import SQLModel
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from itertools import count
+from fastapi import Request, Response
+import anyio.to_thread
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql import Select
+from sqlmodel import SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from core import metrics
 
 load_dotenv()
 
@@ -12,13 +26,357 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Set DATABASE_ASYNC=false to serve requests from the sync engine via the threadpool
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "true").lower() == "true"
+
+# Pool sizing. Checkouts wait at most DB_POOL_TIMEOUT seconds; on exhaustion
+# the API answers 503 instead of queueing more work.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+
+# Threads beyond the pool's capacity would only wait on a connection, so the
+# AnyIO threadpool defaults to the same size instead of its usual 40 tokens.
+THREADPOOL_TOKENS = int(os.getenv("THREADPOOL_TOKENS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+)
+
+pool_wait = metrics.histogram("db_pool_wait_seconds", "Time spent waiting to check out a pooled connection")
+pool_timeouts = metrics.counter("db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT")
+
+class _InstrumentedPool:
+    """Records checkout wait time and timeouts for QueuePool subclasses."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc()
+            raise
+        finally:
+            pool_wait.observe(time.perf_counter() - start)
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str):
+    """Maps a sync DATABASE_URL onto its async driver, or None if there is none."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if not driver:
+        return None
+
+    query = dict(url.query)
+    if backend == "postgresql":
+        # asyncpg takes 'ssl' rather than libpq's 'sslmode'/'channel_binding'
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode:
+            query["ssl"] = sslmode
+    return url.set(drivername=driver, query=query)
+
+def _create_async_engine(url: str):
+    async_url = async_database_url(url)
+    if async_url is None:
+        return None
+    try:
+        options = {}
+        if async_url.get_backend_name() != "sqlite":
+            options = dict(POOL_OPTIONS, poolclass=InstrumentedAsyncQueuePool)
+        return create_async_engine(async_url, **options)
+    except ImportError as e:
+        print(f"Async driver unavailable ({e}); falling back to the sync engine")
+        return None
+
+async_engine = _create_async_engine(DATABASE_URL) if DATABASE_ASYNC else None
+
+# While the async engine serves requests, the sync engine only runs startup
+# migrations, the session reaper and scripts, so it gets a small pool rather
+# than a second full DB_POOL_SIZE + DB_MAX_OVERFLOW budget per process
+SYNC_AUX_POOL_SIZE = int(os.getenv("DB_SYNC_AUX_POOL_SIZE", "2"))
+
+def sync_pool_options(serves_requests: bool) -> dict:
+    if serves_requests:
+        return POOL_OPTIONS
+    return dict(POOL_OPTIONS, pool_size=SYNC_AUX_POOL_SIZE, max_overflow=0)
+
 # Create SQLAlchemy engine
 # NOTE: Following Better Auth principles for secure database connection management
 engine = create_engine(
     DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=5,
-    max_overflow=10,
-    pool_pre_ping=True,
-    pool_recycle=300,
-)
\ No newline at end of file
+    poolclass=InstrumentedQueuePool,
+    **sync_pool_options(async_engine is None),
+)
+
+def _primary_pools():
+    pools = [engine.pool]
+    if async_engine is not None:
+        pools.append(async_engine.pool)
+    return [p for p in pools if isinstance(p, QueuePool)]
+
+metrics.gauge("db_pool_checked_out", "Primary connections currently checked out",
+              lambda: sum(p.checkedout() for p in _primary_pools()))
+metrics.gauge("db_pool_overflow", "Primary connections open beyond pool_size",
+              lambda: sum(max(p.overflow(), 0) for p in _primary_pools()))
+metrics.gauge("db_pool_capacity", "Maximum primary connections (pool_size + max_overflow)",
+              lambda: sum(p.size() + p._max_overflow for p in _primary_pools()))
+
+def configure_threadpool():
+    """Aligns the AnyIO threadpool used by sync endpoints with the DB pool; call from the event loop."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = THREADPOOL_TOKENS
+    metrics.gauge("threadpool_tokens_borrowed", "AnyIO worker threads currently in use", lambda: limiter.borrowed_tokens)
+    metrics.gauge("threadpool_tokens_total", "AnyIO worker thread limit", lambda: limiter.total_tokens)
+
+# Optional read replicas. GET requests read from a replica once the user is
+# known, unless that user wrote within REPLICA_PIN_SECONDS (read-your-writes)
+# or every replica lags the primary by more than REPLICA_MAX_LAG_SECONDS.
+# Writes answer with an X-Replica-Pin header (the pin's expiry, epoch
+# seconds) that clients send back, so the pin holds on every backend pod.
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+REPLICA_PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", "10"))
+# Writers remembered in-process as well, for clients that don't echo the header
+REPLICA_PIN_MAX_USERS = int(os.getenv("REPLICA_PIN_MAX_USERS", "10000"))
+REPLICA_PIN_HEADER = "X-Replica-Pin"
+
+class Replica:
+    """A read replica with its sync/async engines and last measured lag."""
+
+    def __init__(self, url: str):
+        self.async_engine = _create_async_engine(url) if async_engine is not None else None
+        # Lag checks (and threaded reads without an async driver)
+        self.engine = create_engine(
+            url, poolclass=InstrumentedQueuePool, **sync_pool_options(self.async_engine is None)
+        )
+        self.lag = float("inf")  # unusable until the first lag check
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def measure_lag(self):
+        """Seconds the replica trails the primary; 0 when fully replayed."""
+        try:
+            with self.engine.connect() as conn:
+                if conn.dialect.name != "postgresql":
+                    self.lag = 0.0
+                    return
+                self.lag = float(conn.execute(text(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )).scalar())
+        except Exception as e:
+            print(f"Replica lag check failed: {e}")
+            self.lag = float("inf")
+
+replicas = [Replica(url) for url in DATABASE_REPLICA_URLS]
+_replica_cursor = count()
+# user_id -> pin expiry, oldest first; every pin lasts REPLICA_PIN_SECONDS,
+# so expired entries are always at the front. ThreadedSession commits (and
+# so pins) on threadpool workers, hence the lock.
+_pinned_users: OrderedDict = OrderedDict()
+_pinned_lock = threading.Lock()
+
+def pin_user(user_id: str):
+    """Route this user's reads to the primary for REPLICA_PIN_SECONDS."""
+    now = time.monotonic()
+    with _pinned_lock:
+        _pinned_users[user_id] = now + REPLICA_PIN_SECONDS
+        _pinned_users.move_to_end(user_id)
+        while _pinned_users:
+            oldest, until = next(iter(_pinned_users.items()))
+            if until >= now and len(_pinned_users) <= REPLICA_PIN_MAX_USERS:
+                break
+            _pinned_users.pop(oldest)
+
+def is_pinned(user_id: str) -> bool:
+    with _pinned_lock:
+        until = _pinned_users.get(user_id)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            _pinned_users.pop(user_id, None)
+            return False
+        return True
+
+def client_pin(request: Request) -> float:
+    """The pin expiry the client sent back, capped at one pin from now; 0 if none."""
+    try:
+        until = float(request.headers.get(REPLICA_PIN_HEADER, 0))
+    except ValueError:
+        return 0.0
+    return min(until, time.time() + REPLICA_PIN_SECONDS)
+
+def set_client_pin(request: Request, response: Response):
+    """Hands the pin of a request that wrote back to the client."""
+    info = getattr(request.state, "db_session_info", None)
+    if info and info.get("pin_issued"):
+        response.headers[REPLICA_PIN_HEADER] = f"{info['pinned_until']:.3f}"
+
+def pick_replica():
+    """Round-robin over replicas within the lag budget, or None."""
+    healthy = [r for r in replicas if r.healthy]
+    if not healthy:
+        return None
+    return healthy[next(_replica_cursor) % len(healthy)]
+
+async def monitor_replica_lag():
+    while True:
+        for replica in replicas:
+            await run_in_threadpool(replica.measure_lag)
+        await asyncio.sleep(REPLICA_LAG_CHECK_INTERVAL)
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs of read-only requests to a replica.
+    Routing starts once get_current_user records the user on session.info,
+    so auth lookups always hit the primary; after any flush the rest of the
+    session stays on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self._replica_for(clause)
+        if replica is not None:
+            if self.info.get("threaded"):
+                return replica.engine
+            if replica.async_engine is not None:
+                return replica.async_engine.sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+    def _replica_for(self, clause):
+        info = self.info
+        if not replicas or not info.get("read_only") or info.get("wrote") or self._flushing:
+            return None
+        if not isinstance(clause, Select):
+            return None
+        user_id = info.get("user_id")
+        if user_id is None or is_pinned(user_id) or info.get("pinned_until", 0) > time.time():
+            return None
+        if "replica" not in info:
+            info["replica"] = pick_replica()
+        return info["replica"]
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_write(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    # UPDATE/DELETE ... RETURNING and upserts write without a flush
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_writer(session):
+    if session.info.get("wrote") and session.info.get("user_id"):
+        pin_user(session.info["user_id"])
+        session.info["pinned_until"] = time.time() + REPLICA_PIN_SECONDS
+        session.info["pin_issued"] = True
+
+class ThreadedSession:
+    """
+    Sync Session behind the AsyncSession interface.
+    Every database call runs in the threadpool so handlers never block the
+    event loop, even when no async driver is available.
+    """
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.sync_session = RoutingSession(bind, expire_on_commit=False)
+        self.sync_session.info["threaded"] = True
+
+    @property
+    def info(self) -> dict:
+        return self.sync_session.info
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def exec(self, statement, **kwargs):
+        return await run_in_threadpool(self.sync_session.exec, statement, **kwargs)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def refresh(self, instance, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, instance, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+@asynccontextmanager
+async def async_session():
+    """
+    Opens a non-blocking session: AsyncSession on the async engine, or the
+    sync engine behind ThreadedSession as a fallback.
+    """
+    if async_engine is not None:
+        async with AsyncSession(async_engine, expire_on_commit=False, sync_session_class=RoutingSession) as session:
+            yield session
+    else:
+        session = ThreadedSession(engine)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+async def get_session(request: Request):
+    """
+    Request-scoped session dependency.
+    FastAPI resolves a dependency once per request, so get_current_user, the
+    route handler and any MCP tools it calls all share one session and at
+    most one pooled connection. GET/HEAD requests may read from a replica
+    unless the client's X-Replica-Pin is still current.
+    """
+    async with async_session() as session:
+        session.info["read_only"] = request.method in ("GET", "HEAD")
+        session.info["pinned_until"] = client_pin(request)
+        # Lets set_client_pin answer a write with the new pin
+        request.state.db_session_info = session.info
+        yield session
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+    for replica in replicas:
+        if replica.async_engine is not None:
+            await replica.async_engine.dispose()
+        replica.engine.dispose()
@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
-from typing import Optional
-from fastapi import HTTPException, status, Depends
+from typing import NamedTuple, Optional, Tuple
+from fastapi import HTTPException, Query, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlmodel import Session, select
-from config.database import engine
+from sqlalchemy import func, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.database import get_session
+from core.cache import TTLCache
 from models.user import User
 from models.auth import Session as AuthSession
+import hashlib
+import jwt
 import os
 from dotenv import load_dotenv
 
@@ -17,45 +22,285 @@ BETTER_AUTH_SECRET = os.getenv("BETTER_AUTH_SECRET")
 if not BETTER_AUTH_SECRET:
     raise ValueError("BETTER_AUTH_SECRET environment variable must be set")
 
+# Validated sessions are cached in-process so repeated requests skip the DB.
+# Entries never outlive the Better Auth session they were resolved from.
+SESSION_CACHE_TTL = float(os.getenv("AUTH_SESSION_CACHE_TTL", "60"))
+SESSION_CACHE_SIZE = int(os.getenv("AUTH_SESSION_CACHE_SIZE", "10000"))
+
+# Tokens that failed validation are remembered briefly so clients retrying a
+# stale or guessed token are rejected without checking out a DB connection.
+NEGATIVE_CACHE_TTL = float(os.getenv("AUTH_NEGATIVE_CACHE_TTL", "30"))
+NEGATIVE_CACHE_SIZE = int(os.getenv("AUTH_NEGATIVE_CACHE_SIZE", "10000"))
+
+# Optional stateless mode: POST /api/auth/token exchanges a Better Auth session
+# for a short-lived token signed with BETTER_AUTH_SECRET that is verified in
+# pure CPU. The session row is only re-checked for revocation once per interval.
+SIGNED_TOKENS_ENABLED = os.getenv("AUTH_SIGNED_TOKENS", "false").lower() == "true"
+SIGNED_TOKEN_ALGORITHM = os.getenv("ALGORITHM", "HS256")
+SIGNED_TOKEN_TTL = int(os.getenv("AUTH_SIGNED_TOKEN_TTL", "900"))
+REVOCATION_CHECK_INTERVAL = float(os.getenv("AUTH_REVOCATION_CHECK_INTERVAL", "300"))
+
+# A browser EventSource can't send an Authorization header, so event streams
+# also accept ?token= with a signed token good only for opening a stream
+STREAM_TOKEN_TTL = int(os.getenv("AUTH_STREAM_TOKEN_TTL", "60"))
+STREAM_TOKEN_AUDIENCE = "task-events"
+
+session_cache = TTLCache("auth_session_cache", maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+negative_cache = TTLCache("auth_negative_cache", maxsize=NEGATIVE_CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL)
+revocation_checks = TTLCache("auth_revocation_checks", maxsize=SESSION_CACHE_SIZE, ttl=REVOCATION_CHECK_INTERVAL)
+revoked_sessions = TTLCache("auth_revoked_sessions", maxsize=SESSION_CACHE_SIZE, ttl=SIGNED_TOKEN_TTL)
+
+# Better Auth might use 'userId'/'expiresAt' or 'user_id'/'expires_at'
+SESSION_USER_ID = func.coalesce(AuthSession.user_id, AuthSession.userId)
+SESSION_EXPIRES_AT = func.coalesce(AuthSession.expires_at, AuthSession.expiresAt)
+
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+class ResolvedSession(NamedTuple):
+    user: User
+    expires_at: Optional[datetime]
+    session_id: str
 
 # Removed legacy authenticate_user, verify_password, etc.
 # Better Auth handles password hashing and authentication on the frontend.
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+def _unauthorized(detail: str = "Could not validate Better Auth session") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def token_hash(token: str) -> str:
+    """Cache key for a bearer token; raw tokens are never held in memory."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def is_signed_token(token: str) -> bool:
+    """Signed tokens are JWTs; Better Auth session tokens contain no dots."""
+    return token.count(".") == 2
+
+def _revoke_session_id(session_id: str):
+    if SIGNED_TOKENS_ENABLED:
+        revoked_sessions.set(session_id, True)
+
+def invalidate_session(token: str):
+    """Drop a token from the session cache (e.g. after sign-out)."""
+    if is_signed_token(token):
+        try:
+            claims = jwt.decode(
+                token,
+                BETTER_AUTH_SECRET,
+                algorithms=[SIGNED_TOKEN_ALGORITHM],
+                options={"verify_exp": False},
+            )
+        except jwt.InvalidTokenError:
+            return
+        _revoke_session_id(claims.get("sid"))
+        return
+
+    cached = session_cache.pop(token_hash(token))
+    if cached:
+        _revoke_session_id(cached.session_id)
+
+def invalidate_user(user_id: str) -> int:
+    """Drop every cached session belonging to a user."""
+    return session_cache.discard_where(lambda entry: entry.user.id == user_id)
+
+def _cache_session(key: str, resolved: ResolvedSession):
+    ttl = None
+    if resolved.expires_at:
+        ttl = (resolved.expires_at - datetime.utcnow()).total_seconds()
+    session_cache.set(key, resolved, ttl=ttl)
+
+def session_lookup_statement(token: str):
+    """
+    Statement resolving a Better Auth token to its user and expiry in one round trip.
+    Better Auth may write either the camelCase or snake_case columns, so both
+    are coalesced in SQL and only the fields needed by UserRead are selected.
+    """
+    return (
+        select(
+            User.id,
+            User.name,
+            User.email,
+            User.image,
+            User.created_at,
+            User.updated_at,
+            SESSION_EXPIRES_AT.label("expires_at"),
+            AuthSession.id.label("session_id"),
+        )
+        .select_from(AuthSession)
+        .join(User, User.id == SESSION_USER_ID)
+        .where(AuthSession.token == token)
+    )
+
+def resolved_session_from_row(row) -> ResolvedSession:
+    user = User(
+        id=row.id,
+        name=row.name,
+        email=row.email,
+        image=row.image,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+    )
+    return ResolvedSession(user, row.expires_at, row.session_id)
+
+async def resolve_session(session: AsyncSession, token: str) -> Optional[ResolvedSession]:
+    row = (await session.exec(session_lookup_statement(token))).first()
+    return resolved_session_from_row(row) if row else None
+
+async def _resolve_better_auth_token(session: AsyncSession, token: str) -> ResolvedSession:
+    key = token_hash(token)
+
+    cached = session_cache.get(key)
+    if cached:
+        if not cached.expires_at or cached.expires_at >= datetime.utcnow():
+            return cached
+        session_cache.pop(key)
+
+    rejected = negative_cache.get(key)
+    if rejected:
+        raise _unauthorized(rejected)
+
+    resolved = await resolve_session(session, token)
+
+    if not resolved:
+        negative_cache.set(key, "Could not validate Better Auth session")
+        raise _unauthorized()
+
+    if resolved.expires_at and resolved.expires_at < datetime.utcnow():
+        negative_cache.set(key, "Session expired")
+        raise _unauthorized("Session expired")
+
+    _cache_session(key, resolved)
+    return resolved
+
+async def _session_is_live(session: AsyncSession, session_id: str) -> bool:
+    stmt = select(AuthSession.id).where(
+        AuthSession.id == session_id,
+        or_(SESSION_EXPIRES_AT.is_(None), SESSION_EXPIRES_AT >= datetime.utcnow()),
+    )
+    return (await session.exec(stmt)).first() is not None
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+async def _verify_signed_token(session: AsyncSession, token: str) -> User:
+    try:
+        claims = jwt.decode(
+            token,
+            BETTER_AUTH_SECRET,
+            algorithms=[SIGNED_TOKEN_ALGORITHM],
+            options={"require": ["exp", "sub", "sid"]},
+        )
+    except jwt.ExpiredSignatureError:
+        raise _unauthorized("Session expired")
+    except jwt.InvalidTokenError:
+        raise _unauthorized()
+
+    session_id = claims["sid"]
+    if revoked_sessions.get(session_id):
+        raise _unauthorized("Session revoked")
+
+    # Periodic revocation check so a Better Auth sign-out elsewhere still
+    # takes effect within REVOCATION_CHECK_INTERVAL seconds
+    if REVOCATION_CHECK_INTERVAL > 0 and not revocation_checks.get(session_id):
+        if not await _session_is_live(session, session_id):
+            revoked_sessions.set(session_id, True)
+            raise _unauthorized("Session revoked")
+        revocation_checks.set(session_id, True)
+
+    return User(
+        id=claims["sub"],
+        name=claims.get("name"),
+        email=claims.get("email"),
+        image=claims.get("image"),
+        created_at=_parse_timestamp(claims.get("created_at")),
+        updated_at=_parse_timestamp(claims.get("updated_at")),
+    )
+
+async def issue_signed_token(session: AsyncSession, token: str) -> Tuple[str, datetime]:
+    """
+    Exchanges a Better Auth session token for a signed token and its expiry.
+    The signed token never outlives the underlying session.
+    """
+    if not SIGNED_TOKENS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Signed tokens are disabled")
+    if is_signed_token(token):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A Better Auth session token is required")
+
+    resolved = await _resolve_better_auth_token(session, token)
+    user = resolved.user
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=SIGNED_TOKEN_TTL)
+    if resolved.expires_at:
+        expires_at = min(expires_at, resolved.expires_at)
+
+    claims = {
+        "sub": user.id,
+        "sid": resolved.session_id,
+        "name": user.name,
+        "email": user.email,
+        "image": user.image,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "updated_at": user.updated_at.isoformat() if user.updated_at else None,
+        "iat": now,
+        "exp": expires_at,
+    }
+    return jwt.encode(claims, BETTER_AUTH_SECRET, algorithm=SIGNED_TOKEN_ALGORITHM), expires_at
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_session),
+) -> User:
     """
     Better Auth session validator.
-    Checks the token against the Session table.
+    Verifies signed tokens in-process when enabled; otherwise checks the
+    in-process session cache, then the Session table.
     """
     token = credentials.credentials
 
-    with Session(engine) as session:
-        # 1. Try to find Better Auth session by token
-        # Better Auth stores the session token in the 'token' field
-        stmt = select(AuthSession).where(AuthSession.token == token)
-        db_session = session.exec(stmt).first()
-
-        if db_session:
-            # Check expiration (Better Auth might use 'expiresAt' or 'expires_at')
-            expires_at = db_session.expires_at or db_session.expiresAt
-            
-            if expires_at and expires_at < datetime.utcnow():
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Session expired",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-
-            # Get user (Better Auth might use 'userId' or 'user_id')
-            uid = db_session.user_id or db_session.userId
-            if uid:
-                user_stmt = select(User).where(User.id == uid)
-                user = session.exec(user_stmt).first()
-                if user:
-                    return user
-
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate Better Auth session",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
\ No newline at end of file
+    if SIGNED_TOKENS_ENABLED and is_signed_token(token):
+        user = await _verify_signed_token(session, token)
+    else:
+        user = (await _resolve_better_auth_token(session, token)).user
+
+    # Lets the routing session send this request's reads to a replica
+    session.info["user_id"] = user.id
+    return user
+
+def issue_stream_token(user_id: str) -> Tuple[str, datetime]:
+    """Signed token (and its expiry) that opens the user's event stream for STREAM_TOKEN_TTL seconds."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=STREAM_TOKEN_TTL)
+    claims = {"sub": user_id, "aud": STREAM_TOKEN_AUDIENCE, "iat": now, "exp": expires_at}
+    return jwt.encode(claims, BETTER_AUTH_SECRET, algorithm=SIGNED_TOKEN_ALGORITHM), expires_at
+
+async def get_stream_user_id(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    session: AsyncSession = Depends(get_session),
+) -> str:
+    """
+    User id for an event stream: from a stream token in the query string
+    (browsers), or the usual Authorization header (other clients).
+    """
+    if token is None:
+        if credentials is None:
+            raise _unauthorized("Not authenticated")
+        return (await get_current_user(credentials, session)).id
+    try:
+        claims = jwt.decode(
+            token,
+            BETTER_AUTH_SECRET,
+            algorithms=[SIGNED_TOKEN_ALGORITHM],
+            audience=STREAM_TOKEN_AUDIENCE,
+            options={"require": ["exp", "sub", "aud"]},
+        )
+    except jwt.ExpiredSignatureError:
+        raise _unauthorized("Stream token expired")
+    except jwt.InvalidTokenError:
+        raise _unauthorized()
+    session.info["user_id"] = claims["sub"]
+    return claims["sub"]
@@ -0,0 +1,78 @@
+"""
+Bounded in-process caches.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from core import metrics
+
+
+class TTLCache:
+    """
+    Thread-safe LRU mapping whose entries expire after a per-entry deadline.
+    Hits and misses are exported as <name>_hits_total / <name>_misses_total.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.counter(f"{name}_hits_total", f"Lookups served from the {name} cache")
+        self.misses = metrics.counter(f"{name}_misses_total", f"Lookups not found in the {name} cache")
+        metrics.gauge(f"{name}_entries", f"Entries currently held by the {name} cache", lambda: len(self._data))
+        metrics.gauge(f"{name}_hit_ratio", f"Fraction of {name} lookups served from the cache", self.hit_ratio)
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits.value + self.misses.value
+        return self.hits.value / lookups if lookups else 0.0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None when absent or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                deadline, value = entry
+                if deadline > now:
+                    self._data.move_to_end(key)
+                    self.hits.inc()
+                    return value
+                del self._data[key]
+        self.misses.inc()
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value; ttl defaults to the cache TTL and is ignored when not positive"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a single entry"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Remove every entry whose value matches the predicate"""
+        with self._lock:
+            keys = [k for k, (_, v) in self._data.items() if predicate(v)]
+            for k in keys:
+                del self._data[k]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,42 +1,78 @@
 """
 Dapr Integration Layer
-Provides helper functions for Dapr State, Secrets, and Service Invocation
+Provides helper functions for Dapr State, Secrets, Service Invocation and Pub/Sub
+
+One DaprClient per process, opened and closed with the app (start()/close()),
+so every sidecar call reuses pooled keep-alive connections. Bulk publish,
+bulk state reads and state transactions let callers batch instead of making
+one round trip per item.
+
+The recurring engine and notification service images copy this module in
+at build time (see their Dockerfiles), so there is one copy to maintain.
 """
 import httpx
 import os
-import json
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, List
 
 DAPR_HTTP_PORT = os.getenv("DAPR_HTTP_PORT", "3500")
 DAPR_BASE_URL = f"http://localhost:{DAPR_HTTP_PORT}"
 
+# The sidecar is local, so keep plenty of warm connections and reuse them
+DAPR_HTTP_TIMEOUT = float(os.getenv("DAPR_HTTP_TIMEOUT", "10"))
+DAPR_HTTP_MAX_CONNECTIONS = int(os.getenv("DAPR_HTTP_MAX_CONNECTIONS", "100"))
+DAPR_HTTP_MAX_KEEPALIVE = int(os.getenv("DAPR_HTTP_MAX_KEEPALIVE", "20"))
+DAPR_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("DAPR_HTTP_KEEPALIVE_EXPIRY", "60"))
+
 class DaprClient:
     """Client for Dapr sidecar operations"""
-    
+
     def __init__(self):
         self.base_url = DAPR_BASE_URL
-        self.client = httpx.AsyncClient(timeout=10.0)
-    
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """Open the connection pool; call from the app's startup hook."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=DAPR_HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=DAPR_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=DAPR_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=DAPR_HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Scripts and tests that never ran start() still get a pooled client
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=DAPR_HTTP_TIMEOUT)
+        return self._client
+
     # ============ STATE MANAGEMENT ============
-    
+
     async def save_state(self, store_name: str, key: str, value: Any) -> bool:
         """Save state to Dapr state store"""
+        return await self.save_bulk_state(store_name, {key: value})
+
+    async def save_bulk_state(self, store_name: str, items: Dict[str, Any]) -> bool:
+        """Save many key/value pairs in one call"""
+        if not items:
+            return True
         try:
-            url = f"{self.base_url}/v1.0/state/{store_name}"
-            payload = [{
-                "key": key,
-                "value": value
-            }]
+            url = f"/v1.0/state/{store_name}"
+            payload = [{"key": key, "value": value} for key, value in items.items()]
             response = await self.client.post(url, json=payload)
             return response.status_code == 204
         except Exception as e:
             print(f"Dapr state save error: {e}")
             return False
-    
+
     async def get_state(self, store_name: str, key: str) -> Optional[Any]:
         """Retrieve state from Dapr state store"""
         try:
-            url = f"{self.base_url}/v1.0/state/{store_name}/{key}"
+            url = f"/v1.0/state/{store_name}/{key}"
             response = await self.client.get(url)
             if response.status_code == 200:
                 return response.json()
@@ -44,23 +80,62 @@ class DaprClient:
         except Exception as e:
             print(f"Dapr state get error: {e}")
             return None
-    
+
+    async def get_bulk_state(self, store_name: str, keys: List[str], parallelism: int = 10) -> Dict[str, Any]:
+        """Retrieve many keys in one call; missing keys are left out of the result"""
+        if not keys:
+            return {}
+        try:
+            url = f"/v1.0/state/{store_name}/bulk"
+            response = await self.client.post(url, json={"keys": keys, "parallelism": parallelism})
+            if response.status_code != 200:
+                print(f"Dapr bulk state get error: {response.status_code} {response.text}")
+                return {}
+            return {item["key"]: item["data"] for item in response.json() if item.get("data") is not None}
+        except Exception as e:
+            print(f"Dapr bulk state get error: {e}")
+            return {}
+
     async def delete_state(self, store_name: str, key: str) -> bool:
         """Delete state from Dapr state store"""
         try:
-            url = f"{self.base_url}/v1.0/state/{store_name}/{key}"
+            url = f"/v1.0/state/{store_name}/{key}"
             response = await self.client.delete(url)
             return response.status_code == 204
         except Exception as e:
             print(f"Dapr state delete error: {e}")
             return False
-    
+
+    async def execute_state_transaction(
+        self,
+        store_name: str,
+        upserts: Optional[Dict[str, Any]] = None,
+        deletes: Optional[List[str]] = None
+    ) -> bool:
+        """Apply upserts and deletes atomically (the store must support transactions)"""
+        operations = [
+            {"operation": "upsert", "request": {"key": key, "value": value}}
+            for key, value in (upserts or {}).items()
+        ]
+        operations += [{"operation": "delete", "request": {"key": key}} for key in deletes or []]
+        if not operations:
+            return True
+        try:
+            url = f"/v1.0/state/{store_name}/transaction"
+            response = await self.client.post(url, json={"operations": operations})
+            if response.status_code != 204:
+                print(f"Dapr state transaction error: {response.status_code} {response.text}")
+            return response.status_code == 204
+        except Exception as e:
+            print(f"Dapr state transaction error: {e}")
+            return False
+
     # ============ SECRETS MANAGEMENT ============
-    
+
     async def get_secret(self, store_name: str, secret_name: str) -> Optional[Dict[str, str]]:
         """Retrieve secret from Dapr secret store"""
         try:
-            url = f"{self.base_url}/v1.0/secrets/{store_name}/{secret_name}"
+            url = f"/v1.0/secrets/{store_name}/{secret_name}"
             response = await self.client.get(url)
             if response.status_code == 200:
                 return response.json()
@@ -68,19 +143,19 @@ class DaprClient:
         except Exception as e:
             print(f"Dapr secret get error: {e}")
             return None
-    
+
     # ============ SERVICE INVOCATION ============
-    
+
     async def invoke_service(
-        self, 
-        app_id: str, 
-        method: str, 
+        self,
+        app_id: str,
+        method: str,
         data: Optional[Dict] = None,
         http_verb: str = "POST"
     ) -> Optional[Any]:
         """Invoke another service via Dapr service invocation"""
         try:
-            url = f"{self.base_url}/v1.0/invoke/{app_id}/method/{method}"
+            url = f"/v1.0/invoke/{app_id}/method/{method}"
             if http_verb.upper() == "GET":
                 response = await self.client.get(url)
             elif http_verb.upper() == "POST":
@@ -89,29 +164,52 @@ class DaprClient:
                 response = await self.client.delete(url)
             else:
                 response = await self.client.put(url, json=data)
-            
+
             if response.status_code in [200, 201, 204]:
                 return response.json() if response.content else None
             return None
         except Exception as e:
             print(f"Dapr service invocation error: {e}")
             return None
-    
+
     # ============ PUB/SUB ============
-    
+
     async def publish_event(self, pubsub_name: str, topic: str, data: Dict) -> bool:
         """Publish event to Dapr pub/sub"""
         try:
-            url = f"{self.base_url}/v1.0/publish/{pubsub_name}/{topic}"
+            url = f"/v1.0/publish/{pubsub_name}/{topic}"
             response = await self.client.post(url, json=data)
             return response.status_code == 204
         except Exception as e:
             print(f"Dapr publish error: {e}")
             return False
-    
+
+    async def publish_bulk(self, pubsub_name: str, topic: str, entries: List[Dict]) -> List[str]:
+        """
+        Publish many events in one call (Dapr bulk publish, alpha API).
+        Each entry has entryId, event and contentType; returns the entryIds that failed.
+        """
+        entry_ids = [entry["entryId"] for entry in entries]
+        try:
+            url = f"/v1.0-alpha1/publish/bulk/{pubsub_name}/{topic}"
+            response = await self.client.post(url, json=entries)
+            if response.status_code == 204:
+                return []
+            body = response.json() if response.content else {}
+            failed = [entry["entryId"] for entry in body.get("failedEntries", [])]
+            if response.status_code < 300:
+                return failed
+            print(f"Dapr bulk publish error: {response.status_code} {body.get('errorCode', response.text)}")
+            return failed or entry_ids
+        except Exception as e:
+            print(f"Dapr bulk publish error: {e}")
+            return entry_ids
+
     async def close(self):
-        """Close the HTTP client"""
-        await self.client.aclose()
+        """Close the HTTP client; call from the app's shutdown hook."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 # Global instance
 dapr = DaprClient()
@@ -0,0 +1,140 @@
+"""
+Task change events pushed to connected clients.
+
+Write paths record upserts and deletes on the session with record_upsert() /
+record_delete(); when the session commits, the events fan out to this
+process's subscribers and are published on the task.changed topic so other
+backend replicas can deliver them to theirs. Rolled-back sessions drop their
+events.
+"""
+import asyncio
+import os
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event
+
+from config.database import RoutingSession
+from core import metrics
+from core.dapr_client import dapr
+from models.task import Task, TaskRead
+
+# Must be a component whose consumer group is per pod, so every replica
+# receives every event (see deploy/k8s/components/pubsub-task-events.yaml)
+TASK_EVENTS_PUBSUB = os.getenv("TASK_EVENTS_PUBSUB", "task-events")
+TASK_EVENTS_TOPIC = "task.changed"
+# Events buffered per connection before it is told to resync instead
+TASK_EVENTS_QUEUE_SIZE = int(os.getenv("TASK_EVENTS_QUEUE_SIZE", "100"))
+
+# Identifies this process so it ignores its own events coming back from Dapr
+INSTANCE_ID = uuid.uuid4().hex
+
+subscribers_gauge = metrics.gauge("task_event_subscribers", "Open task event streams on this instance")
+delivered = metrics.counter("task_events_delivered_total", "Task events queued to local subscribers")
+dropped = metrics.counter("task_events_dropped_total", "Task events dropped for slow subscribers")
+
+
+class Subscription:
+    """One client stream; `overflowed` means events were lost and it must resync."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=TASK_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, item: dict):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+            delivered.inc()
+        except asyncio.QueueFull:
+            self.overflowed = True
+            dropped.inc()
+            # Wake the reader so it can send the resync notice
+            self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class TaskEventBroker:
+    """In-process fan-out of task events to per-user subscriptions."""
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    @contextmanager
+    def subscribe(self, user_id: str):
+        subscription = Subscription(user_id)
+        self.subscriptions[user_id].add(subscription)
+        subscribers_gauge.set(self.count())
+        try:
+            yield subscription
+        finally:
+            self.subscriptions[user_id].discard(subscription)
+            if not self.subscriptions[user_id]:
+                del self.subscriptions[user_id]
+            subscribers_gauge.set(self.count())
+
+    def count(self) -> int:
+        return sum(len(subs) for subs in self.subscriptions.values())
+
+    def deliver(self, events: List[dict]):
+        """Queue events to local subscribers; must run on the event loop."""
+        for item in events:
+            for subscription in list(self.subscriptions.get(item["user_id"], ())):
+                subscription.put(item)
+
+    def publish(self, events: List[dict]):
+        """Thread-safe: deliver locally and publish to the other replicas."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.deliver, events)
+        asyncio.run_coroutine_threadsafe(self._publish_remote(events), self.loop)
+
+    async def _publish_remote(self, events: List[dict]):
+        await dapr.publish_event(TASK_EVENTS_PUBSUB, TASK_EVENTS_TOPIC, {"origin": INSTANCE_ID, "events": events})
+
+    def receive_remote(self, payload: dict):
+        """Handler body for task.changed deliveries from Dapr."""
+        if payload.get("origin") == INSTANCE_ID:
+            return
+        self.deliver(payload.get("events", []))
+
+
+broker = TaskEventBroker()
+
+
+def _pending(session) -> list:
+    return session.info.setdefault("task_events", [])
+
+
+def record_upsert(session, task: Task):
+    _pending(session).append({
+        "type": "upsert",
+        "user_id": task.user_id,
+        "id": task.id,
+        "version": task.version,
+        "task": TaskRead.model_validate(task).model_dump(mode="json"),
+    })
+
+
+def record_delete(session, user_id: str, task_id: str, version: int):
+    _pending(session).append({"type": "delete", "user_id": user_id, "id": task_id, "version": version})
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _publish_committed(session):
+    events = session.info.pop("task_events", None)
+    if events:
+        broker.publish(events)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _drop_rolled_back(session):
+    session.info.pop("task_events", None)
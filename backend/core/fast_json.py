@@ -0,0 +1,41 @@
+"""
+JSON responses for read-only listings that skip ORM hydration and pydantic
+validation: handlers select plain row tuples and serialize them directly.
+orjson is used when installed; the stdlib encoder is the fallback.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, List
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes; datetimes render as ISO 8601 like pydantic's."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+def rows_as_dicts(result) -> List[dict]:
+    """Turn a column-projected Result into response dicts keyed by column name."""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,30 @@
+"""
+Event-loop stall monitor.
+Sleeps for a fixed interval and records how late it wakes up; any blocking
+call on the loop shows up as lag in event_loop_lag_seconds.
+"""
+import asyncio
+import os
+
+from core import metrics
+
+MONITOR_ENABLED = os.getenv("EVENT_LOOP_MONITOR", "true").lower() == "true"
+MONITOR_INTERVAL = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", "0.1"))
+
+loop_lag = metrics.histogram(
+    "event_loop_lag_seconds",
+    "Delay between a scheduled event-loop wakeup and when it actually ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+max_loop_lag = metrics.gauge("event_loop_lag_max_seconds", "Largest event-loop stall observed since startup")
+
+
+async def monitor_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(MONITOR_INTERVAL)
+        lag = max(loop.time() - start - MONITOR_INTERVAL, 0.0)
+        loop_lag.observe(lag)
+        if lag > max_loop_lag.value:
+            max_loop_lag.set(lag)
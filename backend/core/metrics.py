@@ -0,0 +1,131 @@
+"""
+In-process metrics registry.
+Counters, gauges and histograms are rendered in Prometheus text format at /metrics.
+"""
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: Dict[str, "Metric"] = {}
+_registry_lock = threading.Lock()
+
+
+class Metric:
+    """Base class for registered metrics"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self._value}"]
+
+
+class Gauge(Metric):
+    """Point-in-time value, either set directly or read from a callback at render time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, description)
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return float(self._fn()) if self._fn else self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self.value}"]
+
+
+class Histogram(Metric):
+    """Cumulative bucketed observations"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    def samples(self) -> List[str]:
+        lines = [f'{self.name}_bucket{{le="{bound}"}} {count}' for bound, count in zip(self.buckets, self._counts)]
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self._count}')
+        lines.append(f"{self.name}_sum {self._sum}")
+        lines.append(f"{self.name}_count {self._count}")
+        return lines
+
+
+def _register(metric: Metric) -> Metric:
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name: str, description: str) -> Counter:
+    """Get or create a counter"""
+    return _register(Counter(name, description))
+
+
+def gauge(name: str, description: str, fn: Optional[Callable[[], float]] = None) -> Gauge:
+    """Get or create a gauge"""
+    return _register(Gauge(name, description, fn))
+
+
+def histogram(name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a histogram"""
+    return _register(Histogram(name, description, buckets))
+
+
+def render() -> str:
+    """Render every registered metric in Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(m.render() for m in metrics) + "\n"
@@ -0,0 +1,165 @@
+"""
+Transactional outbox for pub/sub events.
+
+Write paths call enqueue() inside their transaction, so an event is stored
+exactly when the change it announces commits, and the request returns as
+soon as the commit does. The relay (run_relay, started with the app) drains
+due events in batches through Dapr bulk publish, deletes what was delivered
+and reschedules failures with exponential backoff. A batch is claimed in one
+short transaction that leases it (next_attempt_at moves RELAY_CLAIM_SECONDS
+ahead), published with no transaction or connection held, and settled in a
+second; a relay that dies mid-batch leaves the lease to expire. Delivery is at least
+once, so enqueue() gives every payload a unique event_id that consumers
+dedupe on when a batch is redelivered.
+
+Committing an outbox write wakes this process's relay, so events normally
+go out right away rather than on the next poll. Replicas share the table
+through row locks (SKIP LOCKED on Postgres).
+"""
+import asyncio
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, event, insert, update
+from sqlmodel import select
+
+from config.database import RoutingSession, async_session
+from core import metrics
+from core.dapr_client import dapr
+from models.outbox import OutboxEvent
+
+RELAY_ENABLED = os.getenv("OUTBOX_RELAY_ENABLED", "true").lower() == "true"
+RELAY_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "1"))
+RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "300"))
+# How long a claimed batch stays invisible to other relays; must outlast a publish
+RELAY_CLAIM_SECONDS = float(os.getenv("OUTBOX_CLAIM_SECONDS", "60"))
+
+published = metrics.counter("outbox_events_published_total", "Outbox events delivered to Dapr")
+failures = metrics.counter("outbox_publish_failures_total", "Outbox deliveries that failed and were rescheduled")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+async def enqueue(session, pubsub: str, topic: str, events: List[dict]):
+    """
+    Stores events to be published once the session's transaction commits,
+    each stamped with the event_id it keeps across redeliveries.
+    """
+    if not events:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "pubsub": pubsub,
+            "topic": topic,
+            "payload": {**payload, "event_id": str(uuid.uuid4())},
+            "created_at": now,
+            "next_attempt_at": now,
+            "attempts": 0,
+        }
+        for payload in events
+    ]
+    await session.execute(insert(OutboxEvent), rows)
+    session.info["outbox_written"] = True
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1)))
+
+
+async def claim_batch(now: datetime) -> List[OutboxEvent]:
+    """Leases up to RELAY_BATCH_SIZE due events to this relay and commits."""
+    async with async_session() as session:
+        statement = (
+            select(OutboxEvent)
+            .where(OutboxEvent.next_attempt_at <= now)
+            .order_by(OutboxEvent.next_attempt_at, OutboxEvent.id)
+            .limit(RELAY_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        rows = (await session.exec(statement)).all()
+        if rows:
+            lease = now + timedelta(seconds=RELAY_CLAIM_SECONDS)
+            await session.execute(
+                update(OutboxEvent).where(OutboxEvent.id.in_([row.id for row in rows])).values(next_attempt_at=lease)
+            )
+            await session.commit()
+        return rows
+
+
+async def relay_batch() -> int:
+    """Publishes one batch of due events; returns how many were attempted."""
+    rows = await claim_batch(datetime.utcnow())
+    if not rows:
+        return 0
+
+    by_topic = defaultdict(list)
+    for row in rows:
+        by_topic[(row.pubsub, row.topic)].append(row)
+    failed = set()
+    for (pubsub, topic), group in by_topic.items():
+        entries = [
+            {"entryId": str(row.id), "event": row.payload, "contentType": "application/json"}
+            for row in group
+        ]
+        failed |= {int(entry_id) for entry_id in await dapr.publish_bulk(pubsub, topic, entries)}
+
+    now = datetime.utcnow()
+    delivered = [row.id for row in rows if row.id not in failed]
+    async with async_session() as session:
+        if delivered:
+            await session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(delivered)))
+        for row in rows:
+            if row.id in failed:
+                attempts = row.attempts + 1
+                await session.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id == row.id)
+                    .values(attempts=attempts, next_attempt_at=now + retry_delay(attempts))
+                )
+        await session.commit()
+
+    published.inc(len(delivered))
+    failures.inc(len(failed))
+    return len(rows)
+
+
+def wake():
+    """Thread-safe nudge for the relay to drain now."""
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+async def run_relay():
+    """Drains the outbox until cancelled, on every wake() and at least every RELAY_POLL_INTERVAL seconds."""
+    global _loop, _wakeup
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    while True:
+        _wakeup.clear()
+        try:
+            while await relay_batch() == RELAY_BATCH_SIZE:
+                pass
+        except Exception as e:
+            print(f"Outbox relay error: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), RELAY_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _wake_relay(session):
+    if session.info.pop("outbox_written", False):
+        wake()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_outbox_write(session):
+    session.info.pop("outbox_written", None)
@@ -0,0 +1,203 @@
+"""
+Task statements shared by the REST API, the MCP tools and the query-plan check.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, delete, or_, tuple_, update
+from sqlmodel import select
+
+from core.task_tags import tagged_task_ids
+from models.task import PRIORITY_RANK, Task, TaskRead, TaskTombstone
+
+# Exactly the columns TaskRead exposes, for row-tuple reads that skip the ORM
+TASK_READ_COLUMNS = tuple(Task.__table__.c[name] for name in TaskRead.model_fields)
+
+# Columns encode_cursor reads for each sort
+CURSOR_FIELDS = {
+    "priority": ("priority", "created_at", "id"),
+    "due_date": ("due_date", "id"),
+    "created_at": ("created_at", "id"),
+}
+
+
+def _sort_key(sort: Optional[str]) -> str:
+    return sort if sort in ("priority", "due_date") else "created_at"
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Parses a `fields=` sparse fieldset against TaskRead.
+    Returns None for "all fields"; raises ValueError naming unknown fields.
+    """
+    if not fields:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in TaskRead.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(TaskRead.model_fields)}")
+    return names or None
+
+
+def cursor_fields(sort: Optional[str]) -> tuple:
+    return CURSOR_FIELDS[_sort_key(sort)]
+
+
+def task_columns(fields: Optional[List[str]] = None, extra=()):
+    """Columns for a projection: the requested fields plus any `extra` the caller needs."""
+    if fields is None:
+        return TASK_READ_COLUMNS
+    return tuple(Task.__table__.c[name] for name in dict.fromkeys([*fields, *extra]))
+
+
+def encode_cursor(task, sort: Optional[str] = "created_at") -> str:
+    """Opaque cursor pointing just past `task` (a Task or a result row) in the given sort order."""
+    sort = _sort_key(sort)
+    if sort == "priority":
+        key = [PRIORITY_RANK.get(task.priority, 3), task.created_at.isoformat(), task.id]
+    elif sort == "due_date":
+        key = [task.due_date.isoformat() if task.due_date else None, task.id]
+    else:
+        key = [task.created_at.isoformat(), task.id]
+    raw = json.dumps([sort] + key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: Optional[str] = "created_at") -> list:
+    """Inverse of encode_cursor. Raises ValueError for malformed or foreign cursors."""
+    sort = _sort_key(sort)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, *key = json.loads(raw)
+        if cursor_sort != sort:
+            raise ValueError("cursor was issued for a different sort")
+        if sort == "priority":
+            rank, created_at, task_id = key
+            return [int(rank), datetime.fromisoformat(created_at), str(task_id)]
+        if sort == "due_date":
+            due_date, task_id = key
+            return [datetime.fromisoformat(due_date) if due_date else None, str(task_id)]
+        created_at, task_id = key
+        return [datetime.fromisoformat(created_at), str(task_id)]
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def _after(sort: str, key: list):
+    """Keyset predicate for rows strictly after `key` in the sort order."""
+    if sort == "priority":
+        rank, created_at, task_id = key
+        return or_(
+            Task.priority_rank > rank,
+            and_(Task.priority_rank == rank, tuple_(Task.created_at, Task.id) < tuple_(created_at, task_id)),
+        )
+    if sort == "due_date":
+        due_date, task_id = key
+        if due_date is None:
+            return and_(Task.due_date == None, Task.id > task_id)  # noqa: E711
+        return or_(tuple_(Task.due_date, Task.id) > tuple_(due_date, task_id), Task.due_date == None)  # noqa: E711
+    created_at, task_id = key
+    return tuple_(Task.created_at, Task.id) < tuple_(created_at, task_id)
+
+
+def task_list_statement(
+    user_id: str,
+    status: Optional[str] = "all",
+    sort: Optional[str] = "created_at",
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    tag: Optional[str] = None,
+):
+    """
+    A user's tasks, optionally filtered by status and tag, in the requested order.
+    Every order ends in `id` so keyset pages (`after` a decoded cursor) are stable.
+    """
+    statement = select(Task).where(Task.user_id == user_id)
+
+    if status and status != "all":
+        statement = statement.where(Task.status == status)
+
+    if tag:
+        statement = statement.where(Task.id.in_(tagged_task_ids(user_id, tag)))
+
+    sort = _sort_key(sort)
+    if after is not None:
+        statement = statement.where(_after(sort, after))
+
+    if sort == "priority":
+        statement = statement.order_by(Task.priority_rank, Task.created_at.desc(), Task.id.desc())
+    elif sort == "due_date":
+        statement = statement.order_by(Task.due_date.asc().nullslast(), Task.id.asc())
+    else:  # default created_at
+        statement = statement.order_by(Task.created_at.desc(), Task.id.desc())
+
+    if limit is not None:
+        statement = statement.limit(limit)
+
+    return statement
+
+
+def task_rows_statement(
+    user_id: str,
+    status: Optional[str] = "all",
+    sort: Optional[str] = "created_at",
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    columns=TASK_READ_COLUMNS,
+    tag: Optional[str] = None,
+):
+    """task_list_statement projected onto plain columns; rows carry no ORM state."""
+    return task_list_statement(user_id, status, sort, after, limit, tag).with_only_columns(*columns)
+
+
+def owned_task_statement(user_id: str, task_id: str):
+    """A single task, scoped to its owner."""
+    return select(Task).where(Task.id == task_id, Task.user_id == user_id)
+
+
+def owned_task_row_statement(user_id: str, task_id: str, columns=TASK_READ_COLUMNS):
+    """owned_task_statement projected onto plain columns."""
+    return owned_task_statement(user_id, task_id).with_only_columns(*columns)
+
+
+def owned_update_statement(user_id: str, task_id: str, values: dict):
+    """
+    Ownership-scoped UPDATE ... RETURNING the whole row, so a mutation is one
+    round trip instead of select, commit and refresh. Yields no row if the
+    task does not exist or belongs to someone else.
+    """
+    return (
+        update(Task)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .values(**values)
+        .returning(Task)
+    )
+
+
+def complete_statement(user_id: str, task_id: str, version: int):
+    """Marks a task completed and returns it."""
+    values = {"status": "completed", "completed_at": datetime.utcnow(), "version": version}
+    return owned_update_statement(user_id, task_id, values)
+
+
+def owned_delete_statement(user_id: str, task_id: str):
+    """Ownership-scoped DELETE ... RETURNING (id, title) of the removed task."""
+    return delete(Task).where(Task.id == task_id, Task.user_id == user_id).returning(Task.id, Task.title)
+
+
+def changed_tasks_statement(user_id: str, since: int, upto: int):
+    """Tasks written after version `since`, up to and including `upto`."""
+    return (
+        select(Task)
+        .where(Task.user_id == user_id, Task.version > since, Task.version <= upto)
+        .order_by(Task.version, Task.id)
+    )
+
+
+def tombstones_statement(user_id: str, since: int, upto: int):
+    """Ids of tasks deleted after version `since`, up to and including `upto`."""
+    return select(TaskTombstone.id).where(
+        TaskTombstone.user_id == user_id, TaskTombstone.version > since, TaskTombstone.version <= upto
+    )
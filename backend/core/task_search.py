@@ -0,0 +1,143 @@
+"""
+Full-text search over task titles, descriptions and tags.
+
+Postgres keeps a generated `task.search_document` tsvector with a GIN index;
+SQLite keeps an external-content FTS5 table, `task_search_fts`, in step with
+triggers. Neither is portable enough to live on the Task model, so migrate_db
+applies them per dialect from the definitions below and the ORM never loads
+them. Results are ranked (best first) and paged with (rank, id) keyset cursors.
+
+The runner only adds schema, so both carry new names since tags were
+indexed; the title-and-description versions (`search_vector`, `task_fts`)
+are dropped when these are created.
+"""
+import base64
+import json
+import re
+from typing import List, Optional
+
+from sqlalchemy import Column, Computed, Index, MetaData, Table, and_, column, func, literal_column, or_, table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlmodel import select
+
+from core.task_queries import TASK_READ_COLUMNS
+from core.task_tags import tagged_task_ids
+from models.task import Task
+
+SEARCH_CONFIG = "english"
+# Words of a query beyond this are ignored
+SEARCH_MAX_TERMS = 8
+
+# Title matches weigh more than description and tag matches; commas in
+# Task.tags split words like any other punctuation
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(tags, '')), 'B')"
+)
+
+# Idempotent cleanup of the title-and-description search column (Postgres)
+PG_DROP_LEGACY_SEARCH = "ALTER TABLE IF EXISTS task DROP COLUMN IF EXISTS search_vector"
+
+# Postgres-only additions to the task table, diffed by migrate_db like model columns
+search_metadata = MetaData()
+pg_task_search = Table(
+    "task",
+    search_metadata,
+    Column("search_document", TSVECTOR, Computed(SEARCH_VECTOR_SQL)),
+    Index("ix_task_search_document", "search_document", postgresql_using="gin"),
+)
+
+# SQLite: created together when task_search_fts is missing, replacing task_fts;
+# 'rebuild' indexes existing rows
+SQLITE_SEARCH_TABLE = "task_search_fts"
+SQLITE_SEARCH_DDL = [
+    "DROP TRIGGER IF EXISTS task_fts_insert",
+    "DROP TRIGGER IF EXISTS task_fts_delete",
+    "DROP TRIGGER IF EXISTS task_fts_update",
+    "DROP TABLE IF EXISTS task_fts",
+    "CREATE VIRTUAL TABLE task_search_fts USING fts5("
+    "title, description, tags, content='task', tokenize='porter unicode61')",
+    "CREATE TRIGGER task_search_fts_insert AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_search_fts(rowid, title, description, tags) "
+    "VALUES (new.rowid, new.title, new.description, new.tags); END",
+    "CREATE TRIGGER task_search_fts_delete AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_search_fts(task_search_fts, rowid, title, description, tags) "
+    "VALUES ('delete', old.rowid, old.title, old.description, old.tags); END",
+    "CREATE TRIGGER task_search_fts_update AFTER UPDATE OF title, description, tags ON task BEGIN "
+    "INSERT INTO task_search_fts(task_search_fts, rowid, title, description, tags) "
+    "VALUES ('delete', old.rowid, old.title, old.description, old.tags); "
+    "INSERT INTO task_search_fts(rowid, title, description, tags) "
+    "VALUES (new.rowid, new.title, new.description, new.tags); END",
+    "INSERT INTO task_search_fts(task_search_fts) VALUES ('rebuild')",
+]
+
+_search_document = literal_column("task.search_document", TSVECTOR)
+_fts = table(SQLITE_SEARCH_TABLE, column("rowid"))
+
+
+def search_terms(q: Optional[str]) -> List[str]:
+    """Words of a search query; punctuation and query operators are dropped."""
+    return re.findall(r"\w+", (q or "").lower())[:SEARCH_MAX_TERMS]
+
+
+def _match_and_rank(dialect_name: str, terms: List[str]):
+    """Every term must match, as a prefix so half-typed words still find tasks."""
+    if dialect_name == "postgresql":
+        query = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        return _search_document.op("@@")(query), func.ts_rank_cd(_search_document, query)
+    fts = literal_column(SQLITE_SEARCH_TABLE)
+    match = " ".join(f'"{term}"*' for term in terms)
+    # bm25() is lower-is-better; negate it so both dialects rank descending
+    return fts.op("MATCH")(match), -func.bm25(fts, 2.0, 1.0, 1.0)
+
+
+def search_statement(
+    dialect_name: str,
+    user_id: str,
+    terms: List[str],
+    status: Optional[str] = "all",
+    tag: Optional[str] = None,
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    columns=TASK_READ_COLUMNS,
+):
+    """
+    A user's tasks matching all `terms`, best first, as rows of `columns`
+    plus `rank`. `after` is a decoded search cursor.
+    """
+    match, rank = _match_and_rank(dialect_name, terms)
+    statement = select(*columns, rank.label("rank")).where(Task.user_id == user_id, match)
+    if dialect_name != "postgresql":
+        statement = statement.select_from(Task.__table__.join(_fts, _fts.c.rowid == literal_column("task.rowid")))
+
+    if status and status != "all":
+        statement = statement.where(Task.status == status)
+    if tag:
+        statement = statement.where(Task.id.in_(tagged_task_ids(user_id, tag)))
+    if after is not None:
+        after_rank, task_id = after
+        statement = statement.where(or_(rank < after_rank, and_(rank == after_rank, Task.id < task_id)))
+
+    statement = statement.order_by(rank.desc(), Task.id.desc())
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+def encode_search_cursor(row) -> str:
+    """Opaque cursor pointing just past a search result row."""
+    raw = json.dumps(["search", row.rank, row.id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> list:
+    """Inverse of encode_search_cursor. Raises ValueError for malformed or foreign cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, rank, task_id = json.loads(raw)
+        if kind != "search":
+            raise ValueError("cursor was not issued for a search")
+        return [float(rank), str(task_id)]
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
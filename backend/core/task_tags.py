@@ -0,0 +1,95 @@
+"""
+Normalized task tags.
+
+Task.tags stays the comma-separated string clients read and write. Every
+code path that sets it calls sync_task_tags() in the same transaction, and
+every path that deletes tasks runs untag_statement() before the delete, so
+the tag and task_tag tables mirror the strings. Tag filters and tag counts
+then read those tables through their indexes instead of scanning tasks.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+
+from models.task import Tag, TaskTag
+
+_table = Tag.__table__
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Distinct tag names in a Task.tags string, trimmed and lower-cased."""
+    names = (name.strip().lower() for name in (tags or "").split(","))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def tag_upsert_statement(dialect_name: str, pairs: Iterable[Tuple[str, str]]):
+    """Inserts the (user_id, name) tags that don't exist yet."""
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return (
+        dialect_insert(_table)
+        .values([{"user_id": user_id, "name": name} for user_id, name in pairs])
+        .on_conflict_do_nothing(index_elements=[_table.c.user_id, _table.c.name])
+    )
+
+
+def tag_ids_statement(pairs: List[Tuple[str, str]]):
+    return select(Tag.user_id, Tag.name, Tag.id).where(tuple_(Tag.user_id, Tag.name).in_(pairs))
+
+
+def untag_statement(user_id: str, task_ids: List[str]):
+    """Removes the tag links of the user's given tasks."""
+    owned_tags = select(Tag.id).where(Tag.user_id == user_id)
+    return delete(TaskTag).where(TaskTag.task_id.in_(task_ids), TaskTag.tag_id.in_(owned_tags))
+
+
+def tagged_task_ids(user_id: str, tag: str):
+    """Subquery of the ids of the user's tasks carrying `tag`."""
+    return (
+        select(TaskTag.task_id)
+        .join(Tag, Tag.id == TaskTag.tag_id)
+        .where(Tag.user_id == user_id, Tag.name == tag.strip().lower())
+    )
+
+
+def tag_counts_statement(user_id: str):
+    count = func.count(TaskTag.task_id)
+    return (
+        select(Tag.name.label("tag"), count.label("count"))
+        .join(TaskTag, TaskTag.tag_id == Tag.id)
+        .where(Tag.user_id == user_id)
+        .group_by(Tag.name)
+        .order_by(count.desc(), Tag.name)
+    )
+
+
+def link_rows(links: Dict[str, Tuple[str, List[str]]], tag_ids: Dict[Tuple[str, str], int]) -> List[dict]:
+    """task_tag rows for {task_id: (user_id, names)} given {(user_id, name): tag_id}."""
+    return [
+        {"tag_id": tag_ids[(user_id, name)], "task_id": task_id}
+        for task_id, (user_id, names) in links.items()
+        for name in names
+    ]
+
+
+async def sync_task_tags(session, user_id: str, tags_by_task: Dict[str, Optional[str]], new: bool = False):
+    """
+    Points the task_tag links of the user's tasks at the tags in their
+    Task.tags strings. `new` skips clearing links for tasks just inserted.
+    """
+    if not tags_by_task:
+        return
+    if not new:
+        await session.execute(untag_statement(user_id, list(tags_by_task)))
+
+    links = {task_id: (user_id, parse_tags(tags)) for task_id, tags in tags_by_task.items()}
+    pairs = sorted({(user_id, name) for _, names in links.values() for name in names})
+    if not pairs:
+        return
+    # Tasks inserted through the ORM must exist before links can reference them
+    await session.flush()
+    await session.execute(tag_upsert_statement(session.bind.dialect.name, pairs))
+    rows = (await session.execute(tag_ids_statement(pairs))).all()
+    tag_ids = {(row.user_id, row.name): row.id for row in rows}
+    await session.execute(insert(TaskTag), link_rows(links, tag_ids))
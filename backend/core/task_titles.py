@@ -0,0 +1,116 @@
+"""
+Resolves a task title as a user would say it ("the groceries task") to one task.
+
+Postgres ranks the user's tasks by pg_trgm word similarity through a trigram
+GIN index on task.title; other databases (and Postgres without pg_trgm) score the titles in process with the
+same measure over word trigrams, so word order doesn't matter on either. A
+clear winner resolves directly, otherwise the best few candidates come back
+so the user can pick one.
+"""
+import os
+import re
+from typing import List, Optional, Set
+
+from sqlalchemy import Column, Index, MetaData, String, Table, func, literal, text
+from sqlmodel import select
+
+from models.task import Task
+
+# Candidates returned when a title is ambiguous
+RESOLVE_CANDIDATES = 5
+# In-process scores below this are not candidates at all (Postgres uses
+# pg_trgm.word_similarity_threshold through the <% operator instead)
+RESOLVE_MIN_SCORE = float(os.getenv("TASK_RESOLVE_MIN_SCORE", "0.5"))
+# How far the best candidate must lead the runner-up to win outright
+RESOLVE_MARGIN = float(os.getenv("TASK_RESOLVE_MARGIN", "0.15"))
+
+# Postgres-only trigram index, applied by migrate_db after CREATE EXTENSION pg_trgm
+PG_TRGM_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+pg_task_titles = Table(
+    "task",
+    MetaData(),
+    Column("title", String),
+    Index("ix_task_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+)
+
+# Whether pg_trgm is installed; migrate_db skips it when the role may not
+# create extensions, and titles are then scored in process instead
+_pg_trgm: Optional[bool] = None
+
+
+async def has_pg_trgm(session) -> bool:
+    global _pg_trgm
+    if _pg_trgm is None:
+        statement = text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        _pg_trgm = (await session.execute(statement)).first() is not None
+    return _pg_trgm
+
+
+def _trigrams(text: str) -> Set[str]:
+    """pg_trgm's trigrams: each word padded with two spaces before and one after."""
+    grams = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def title_score(query: str, title: str) -> float:
+    """
+    In-process similarity in [0, 1]: the share of the query's word trigrams
+    found in the title, like pg_trgm's word_similarity. Only an exact title
+    scores 1.0; one containing the query scores 0.9.
+    """
+    query, title = query.strip().lower(), title.strip().lower()
+    if query == title:
+        return 1.0
+    if query in title:
+        return 0.9
+    wanted = _trigrams(query)
+    if not wanted:
+        return 0.0
+    return min(0.9, len(wanted & _trigrams(title)) / len(wanted))
+
+
+def names_title(query: str, title: str) -> bool:
+    """True when `query` is the title or a literal part of it, not just similar."""
+    query = query.strip().lower()
+    return bool(query) and query in title.strip().lower()
+
+
+async def title_candidates(session, user_id: str, query: str, status: Optional[str] = None) -> List[dict]:
+    """The user's tasks most like `query`, best first, as {id, title, status, score}."""
+    query = query.strip()
+    scope = [Task.user_id == user_id]
+    if status:
+        scope.append(Task.status == status)
+
+    if session.bind.dialect.name == "postgresql" and await has_pg_trgm(session):
+        score = func.word_similarity(query, Task.title)
+        statement = (
+            select(Task.id, Task.title, Task.status, score.label("score"))
+            .where(*scope, literal(query).op("<%")(Task.title))
+            .order_by(score.desc(), Task.created_at.desc())
+            .limit(RESOLVE_CANDIDATES)
+        )
+        return [row._asdict() for row in (await session.execute(statement)).all()]
+
+    rows = (await session.execute(select(Task.id, Task.title, Task.status).where(*scope))).all()
+    scored = [{**row._asdict(), "score": title_score(query, row.title)} for row in rows]
+    scored = [candidate for candidate in scored if candidate["score"] >= RESOLVE_MIN_SCORE]
+    return sorted(scored, key=lambda candidate: candidate["score"], reverse=True)[:RESOLVE_CANDIDATES]
+
+
+def best_match(query: str, candidates: List[dict]) -> Optional[dict]:
+    """The winning candidate, or None when there is none or it's too close to call."""
+    if not candidates:
+        return None
+    top = candidates[0]
+    if len(candidates) == 1:
+        return top
+    exact = [c for c in candidates if c["title"].strip().lower() == query.strip().lower()]
+    if len(exact) == 1:
+        return exact[0]
+    if top["score"] - candidates[1]["score"] >= RESOLVE_MARGIN:
+        return top
+    return None
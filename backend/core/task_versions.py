@@ -0,0 +1,97 @@
+"""
+Per-user task-list versions, and the ETags and delta-sync tokens derived from them.
+
+Every code path that writes tasks calls bump_task_list_version() first in its
+transaction and stamps the rows it writes (and the tombstones of rows it
+deletes) with the returned version. The upsert's row lock orders concurrent
+writers of one user, so versions commit in order and "version > since" never
+skips a change.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+
+from models.task import TaskListVersion, TaskTombstone
+
+# Tombstones older than this are purged; older sync tokens get a full reset
+TOMBSTONE_RETENTION = timedelta(days=float(os.getenv("TASK_TOMBSTONE_RETENTION_DAYS", "30")))
+
+_table = TaskListVersion.__table__
+
+
+def bump_version_statement(dialect_name: str, user_id: str):
+    """Upsert that increments the user's version and returns the new value."""
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    now = datetime.utcnow()
+    return (
+        dialect_insert(_table)
+        .values(user_id=user_id, version=1, updated_at=now)
+        .on_conflict_do_update(
+            index_elements=[_table.c.user_id],
+            set_={"version": _table.c.version + 1, "updated_at": now},
+        )
+        .returning(_table.c.version)
+    )
+
+
+async def bump_task_list_version(session, user_id: str) -> int:
+    """
+    Call before the task writes of a transaction and stamp them with the
+    result; the upsert holds the user's version row lock until commit.
+    """
+    statement = bump_version_statement(session.bind.dialect.name, user_id)
+    return (await session.execute(statement)).scalar_one()
+
+
+async def task_list_version(session, user_id: str) -> int:
+    statement = select(TaskListVersion.version).where(TaskListVersion.user_id == user_id)
+    return (await session.exec(statement)).first() or 0
+
+
+def task_list_etag(user_id: str, version: int, scope: str = "tasks") -> str:
+    """
+    Weak ETag; `scope` keeps list and single-task representations apart.
+    Versions are per user, so a hash of the user id keeps one user's ETag
+    from ever validating another user's cached copy.
+    """
+    owner = hashlib.sha256(user_id.encode()).hexdigest()[:12]
+    return f'W/"{scope}-{owner}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == bare for candidate in if_none_match.split(","))
+
+
+def tombstone_statement(user_id: str, task_ids: List[str], version: int):
+    now = datetime.utcnow()
+    rows = [{"id": task_id, "user_id": user_id, "version": version, "deleted_at": now} for task_id in task_ids]
+    return insert(TaskTombstone.__table__).values(rows)
+
+
+def encode_sync_token(version: int) -> str:
+    return f"{version}.{int(datetime.utcnow().timestamp())}"
+
+
+def decode_sync_token(token: str) -> Tuple[int, datetime]:
+    """Returns (version, issued_at). Raises ValueError for malformed tokens."""
+    try:
+        version, issued = token.split(".")
+        return int(version), datetime.utcfromtimestamp(int(issued))
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError(f"Invalid sync token: {token!r}") from e
+
+
+def token_expired(issued_at: datetime) -> bool:
+    """True once tombstones the token may still need could have been purged."""
+    return issued_at < datetime.utcnow() - TOMBSTONE_RETENTION
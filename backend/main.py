@@ -1,21 +1,83 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from fastapi.middleware.cors import CORSMiddleware
-from config.database import engine
+from dapr.ext.fastapi import DaprApp
+from config.database import (
+    REPLICA_PIN_HEADER,
+    configure_threadpool,
+    dispose_engines,
+    monitor_replica_lag,
+    replicas,
+    set_client_pin,
+)
 from models.user import User  # noqa: F401
 from models.task import Task  # noqa: F401
 from models.conversation import Conversation  # noqa: F401
 from models.message import Message  # noqa: F401
 from models.auth import Session as AuthSession, Account, Verification  # noqa: F401
+from models.outbox import OutboxEvent  # noqa: F401
 from api.auth import router as auth_router
 from api.tasks import router as tasks_router
 from api.chat import router as chat_router
+from core import metrics, loop_monitor, outbox, session_reaper
+from core.dapr_client import dapr
+from core.events import TASK_EVENTS_PUBSUB, TASK_EVENTS_TOPIC, broker
+from migrate_db import ensure_schema
 
 app = FastAPI(title="Todo API", version="1.0.0")
+dapr_app = DaprApp(app)
 
 @app.on_event("startup")
 def on_startup():
-    from sqlmodel import SQLModel
-    SQLModel.metadata.create_all(bind=engine)
+    # No DDL unless the recorded schema version differs from the models
+    ensure_schema()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    configure_threadpool()
+    # One pooled sidecar client for events, the outbox relay and state calls
+    await dapr.start()
+    broker.start(asyncio.get_running_loop())
+    app.state.background_tasks = []
+    if session_reaper.PURGE_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(session_reaper.run_reaper()))
+    if outbox.RELAY_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(outbox.run_relay()))
+    if loop_monitor.MONITOR_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(loop_monitor.monitor_loop_lag()))
+    if replicas:
+        app.state.background_tasks.append(asyncio.create_task(monitor_replica_lag()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in app.state.background_tasks:
+        task.cancel()
+    await dapr.close()
+    await dispose_engines()
+
+@dapr_app.subscribe(pubsub=TASK_EVENTS_PUBSUB, topic=TASK_EVENTS_TOPIC)
+async def task_changed_handler(event_data = Body(...)):
+    """Task changes committed by other replicas and services, for local event streams."""
+    broker.receive_remote(event_data.get("data", event_data))
+    return {"status": "SUCCESS"}
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_exhausted_handler(request: Request, exc: PoolTimeoutError):
+    """Fail fast when no connection frees up within DB_POOL_TIMEOUT."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.middleware("http")
+async def carry_replica_pin(request: Request, call_next):
+    """Read-your-writes across pods: clients echo the pin a write returns."""
+    response = await call_next(request)
+    set_client_pin(request, response)
+    return response
 
 # CORS middleware
 app.add_middleware(
@@ -24,6 +86,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", REPLICA_PIN_HEADER],
 )
 
 # Include routers
@@ -37,4 +100,9 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus scrape endpoint for in-process metrics"""
+    return metrics.render()
@@ -1,37 +1,55 @@
 from mcp.server import Server
-from .tools import add_task, list_tasks, update_task, delete_task, complete_task
+from config.database import async_session
+from .tools import add_task, list_tasks, search_tasks, update_task, delete_task, complete_task, delete_task_by_title, complete_task_by_title
 import mcp.types as types
 
 # Initialize MCP Server
 mcp_server = Server("todo-mcp")
 
+async def _run_tool(tool, *args, **kwargs) -> str:
+    """Standalone MCP calls get their own session and commit on success."""
+    async with async_session() as session:
+        result = await tool(session, *args, **kwargs)
+        await session.commit()
+    return str(result)
+
 # Register tools
 @mcp_server.tool()
 async def add_todo_task(user_id: str, title: str, description: str = None) -> str:
     """Add a new task to the list."""
-    result = add_task(user_id, title, description)
-    return str(result)
+    return await _run_tool(add_task, user_id, title, description)
 
 @mcp_server.tool()
-async def get_todo_tasks(user_id: str, status: str = "all") -> str:
-    """List all tasks, optionally filtered by status (pending/completed/all)."""
-    result = list_tasks(user_id, status)
-    return str(result)
+async def get_todo_tasks(user_id: str, status: str = "all", since: str = None, tag: str = None) -> str:
+    """List all tasks, optionally filtered by status (pending/completed/all) and tag, or only changes since a sync token."""
+    return await _run_tool(list_tasks, user_id, status, since=since, tag=tag)
+
+@mcp_server.tool()
+async def search_todo_tasks(user_id: str, query: str, status: str = "all") -> str:
+    """Find tasks whose title, description or tags match the query words, best match first."""
+    return await _run_tool(search_tasks, user_id, query, status)
 
 @mcp_server.tool()
 async def update_todo_task(user_id: str, task_id: str, title: str = None, description: str = None) -> str:
     """Update a task's title or description."""
-    result = update_task(user_id, task_id, title, description)
-    return str(result)
+    return await _run_tool(update_task, user_id, task_id, title, description)
 
 @mcp_server.tool()
 async def delete_todo_task(user_id: str, task_id: str) -> str:
     """Delete a task by ID."""
-    result = delete_task(user_id, task_id)
-    return str(result)
+    return await _run_tool(delete_task, user_id, task_id)
 
 @mcp_server.tool()
 async def complete_todo_task(user_id: str, task_id: str) -> str:
     """Mark a task as complete."""
-    result = complete_task(user_id, task_id)
-    return str(result)
+    return await _run_tool(complete_task, user_id, task_id)
+
+@mcp_server.tool()
+async def complete_todo_task_by_title(user_id: str, task_title: str) -> str:
+    """Mark the pending task whose title best matches as complete, or list the candidates if it's ambiguous."""
+    return await _run_tool(complete_task_by_title, user_id, task_title)
+
+@mcp_server.tool()
+async def delete_todo_task_by_title(user_id: str, task_title: str) -> str:
+    """Delete the task whose title is or contains `task_title`, or list the candidates to confirm."""
+    return await _run_tool(delete_task_by_title, user_id, task_title)
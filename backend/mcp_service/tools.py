@@ -1,13 +1,38 @@
-from sqlmodel import Session, select
-from typing import Optional, List, Dict, Any
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
-from config.database import engine
 from models.task import Task
+from core.events import record_delete, record_upsert
+from core.task_queries import (
+    changed_tasks_statement,
+    complete_statement,
+    owned_delete_statement,
+    owned_task_statement,
+    owned_update_statement,
+    task_list_statement,
+    tombstones_statement,
+)
+from core.task_search import search_statement, search_terms
+from core.task_tags import sync_task_tags, untag_statement
+from core.task_titles import best_match, names_title, title_candidates
+from core.task_versions import (
+    bump_task_list_version,
+    decode_sync_token,
+    encode_sync_token,
+    task_list_version,
+    token_expired,
+    tombstone_statement,
+)
 from models.user import User
 
-def add_task(
-    user_id: str, 
-    title: str, 
+# Tools run inside the caller's session and never commit; the caller owns the
+# transaction so every mutation of a chat turn commits together. Mutations are
+# single UPDATE/DELETE ... RETURNING statements scoped to the owner.
+
+async def add_task(
+    session: AsyncSession,
+    user_id: str,
+    title: str,
     description: Optional[str] = None,
     priority: Optional[str] = "medium",
     tags: Optional[str] = None,
@@ -18,86 +43,121 @@ def add_task(
     """
     Create a new task with Phase 5 fields.
     """
-    with Session(engine) as session:
-        user = session.get(User, user_id)
-        if not user:
-            return {"error": "User not found"}
-
-        # Convert string due_date to datetime if provided
-        dt_due = None
-        if due_date:
-            try:
-                dt_due = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-            except:
-                pass
-
-        task = Task(
-            title=title,
-            description=description,
-            priority=priority,
-            tags=tags,
-            due_date=dt_due,
-            is_recurring=is_recurring,
-            recurrence_pattern=recurrence_pattern,
-            user_id=user_id,
-            status="pending"
-        )
-        session.add(task)
-        session.commit()
-        session.refresh(task)
-        
-        return {
-            "task_id": task.id,
-            "status": "created",
-            "title": task.title,
-            "priority": task.priority
-        }
-
-def list_tasks(
-    user_id: str, 
+    user = await session.get(User, user_id)
+    if not user:
+        return {"error": "User not found"}
+
+    # Convert string due_date to datetime if provided
+    dt_due = None
+    if due_date:
+        try:
+            dt_due = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
+        except:
+            pass
+
+    version = await bump_task_list_version(session, user_id)
+    task = Task(
+        title=title,
+        description=description,
+        priority=priority,
+        tags=tags,
+        due_date=dt_due,
+        is_recurring=is_recurring,
+        recurrence_pattern=recurrence_pattern,
+        user_id=user_id,
+        status="pending",
+        version=version
+    )
+    session.add(task)
+    await session.flush()
+    if task.tags:
+        await sync_task_tags(session, user_id, {task.id: task.tags}, new=True)
+    record_upsert(session, task)
+
+    return {
+        "task_id": task.id,
+        "status": "created",
+        "title": task.title,
+        "priority": task.priority
+    }
+
+async def list_tasks(
+    session: AsyncSession,
+    user_id: str,
+    status: Optional[str] = "all",
+    sort: Optional[str] = "created_at",
+    since: Optional[str] = None,
+    tag: Optional[str] = None
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    List tasks with status and tag filtering and sorting.
+    With `since` (a sync token, or "0" for the first call) only the tasks
+    changed and ids deleted since that token are returned, with a new token.
+    """
+    if since is not None:
+        return await _task_changes(session, user_id, since)
+
+    query = task_list_statement(user_id, status, sort, tag=tag)
+    tasks = (await session.exec(query)).all()
+
+    return [_task_summary(t) for t in tasks]
+
+async def search_tasks(
+    session: AsyncSession,
+    user_id: str,
+    query: str,
     status: Optional[str] = "all",
-    sort: Optional[str] = "created_at"
-) -> List[Dict[str, Any]]:
-    """
-    List tasks with status filtering and sorting.
-    """
-    with Session(engine) as session:
-        query = select(Task).where(Task.user_id == user_id)
-        
-        if status and status != "all":
-            query = query.where(Task.status == status)
-            
-        if sort == "priority":
-            from sqlalchemy import case
-            query = query.order_by(case(
-                (Task.priority == "high", 0),
-                (Task.priority == "medium", 1),
-                (Task.priority == "low", 2)
-            ))
-        elif sort == "due_date":
-            query = query.order_by(Task.due_date.asc())
-        else:
-            query = query.order_by(Task.created_at.desc())
-            
-        tasks = session.exec(query).all()
-        
-        return [
-            {
-                "id": t.id,
-                "title": t.title,
-                "completed": t.status == "completed",
-                "status": t.status,
-                "priority": t.priority,
-                "due_date": t.due_date.isoformat() if t.due_date else None,
-                "tags": t.tags
-            }
-            for t in tasks
-        ]
-
-def update_task(
-    user_id: str, 
-    task_id: str, 
-    title: Optional[str] = None, 
+    limit: int = 10
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Full-text search of task titles, descriptions and tags, best match first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    statement = search_statement(session.bind.dialect.name, user_id, terms, status, limit=max(1, min(int(limit), 50)))
+    rows = (await session.execute(statement)).all()
+
+    return [_task_summary(row) for row in rows]
+
+def _task_summary(t: Task) -> Dict[str, Any]:
+    return {
+        "id": t.id,
+        "title": t.title,
+        "completed": t.status == "completed",
+        "status": t.status,
+        "priority": t.priority,
+        "due_date": t.due_date.isoformat() if t.due_date else None,
+        "tags": t.tags
+    }
+
+async def _task_changes(session: AsyncSession, user_id: str, since: str) -> Dict[str, Any]:
+    try:
+        since_version, issued_at = decode_sync_token(since) if since != "0" else (0, None)
+    except ValueError as e:
+        return {"error": str(e)}
+    reset = issued_at is None or token_expired(issued_at)
+
+    current = await task_list_version(session, user_id)
+    if reset:
+        changed = (await session.exec(task_list_statement(user_id))).all()
+        deleted = []
+    else:
+        changed = (await session.exec(changed_tasks_statement(user_id, since_version, current))).all()
+        deleted = (await session.exec(tombstones_statement(user_id, since_version, current))).all()
+
+    return {
+        "changed": [_task_summary(t) for t in changed],
+        "deleted": list(deleted),
+        "token": encode_sync_token(current),
+        "reset": reset
+    }
+
+async def update_task(
+    session: AsyncSession,
+    user_id: str,
+    task_id: str,
+    title: Optional[str] = None,
     description: Optional[str] = None,
     priority: Optional[str] = None,
     tags: Optional[str] = None,
@@ -107,75 +167,130 @@ def update_task(
     """
     Update any task field including Phase 5 properties.
     """
-    with Session(engine) as session:
-        query = select(Task).where(Task.id == task_id, Task.user_id == user_id)
-        task = session.exec(query).first()
-        
-        if not task:
-            return {"error": "Task not found"}
-            
-        if title: task.title = title
-        if description: task.description = description
-        if priority: task.priority = priority
-        if tags: task.tags = tags
-        if status: task.status = status
-        
-        if due_date:
-            try:
-                task.due_date = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-            except:
-                pass
-            
-        session.add(task)
-        session.commit()
-        session.refresh(task)
-        
-        return {
-            "task_id": task.id,
-            "status": "updated",
-            "title": task.title
-        }
-
-def delete_task(user_id: str, task_id: str) -> Dict[str, Any]:
+    values = {}
+    if title: values["title"] = title
+    if description: values["description"] = description
+    if priority: values["priority"] = priority
+    if tags: values["tags"] = tags
+    if status: values["status"] = status
+
+    if due_date:
+        try:
+            values["due_date"] = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
+        except:
+            pass
+
+    if values:
+        values["version"] = await bump_task_list_version(session, user_id)
+        query = owned_update_statement(user_id, task_id, values)
+    else:
+        query = owned_task_statement(user_id, task_id)
+    task = (await session.execute(query)).scalars().first()
+
+    if not task:
+        return {"error": "Task not found"}
+
+    if "tags" in values:
+        await sync_task_tags(session, user_id, {task.id: task.tags})
+    if values:
+        record_upsert(session, task)
+
+    return {
+        "task_id": task.id,
+        "status": "updated",
+        "title": task.title
+    }
+
+async def delete_task(session: AsyncSession, user_id: str, task_id: str) -> Dict[str, Any]:
     """
     Delete a task.
     """
-    with Session(engine) as session:
-        query = select(Task).where(Task.id == task_id, Task.user_id == user_id)
-        task = session.exec(query).first()
-        
-        if not task:
-            return {"error": "Task not found"}
-            
-        title = task.title
-        session.delete(task)
-        session.commit()
-        
-        return {
-            "task_id": task_id,
-            "status": "deleted",
-            "title": title
-        }
-
-def complete_task(user_id: str, task_id: str) -> Dict[str, Any]:
+    version = await bump_task_list_version(session, user_id)
+    await session.execute(untag_statement(user_id, [task_id]))
+    query = owned_delete_statement(user_id, task_id)
+    deleted = (await session.execute(query)).first()
+
+    if not deleted:
+        return {"error": "Task not found"}
+
+    await session.execute(tombstone_statement(user_id, [task_id], version))
+    record_delete(session, user_id, task_id, version)
+
+    return {
+        "task_id": task_id,
+        "status": "deleted",
+        "title": deleted.title
+    }
+
+async def complete_task(session: AsyncSession, user_id: str, task_id: str) -> Dict[str, Any]:
     """
     Mark a task as complete.
     """
-    with Session(engine) as session:
-        query = select(Task).where(Task.id == task_id, Task.user_id == user_id)
-        task = session.exec(query).first()
-        
-        if not task:
-            return {"error": "Task not found"}
-            
-        task.status = "completed"
-        task.completed_at = datetime.utcnow()
-        session.add(task)
-        session.commit()
-        session.refresh(task)
-        
-        return {
-            "task_id": task.id,
-            "status": "completed",
-            "title": task.title
-        }
+    version = await bump_task_list_version(session, user_id)
+    query = complete_statement(user_id, task_id, version)
+    task = (await session.execute(query)).scalars().first()
+
+    if not task:
+        return {"error": "Task not found"}
+
+    record_upsert(session, task)
+
+    return {
+        "task_id": task.id,
+        "status": "completed",
+        "title": task.title
+    }
+
+async def _resolve_title(
+    session: AsyncSession, user_id: str, task_title: str, status: Optional[str] = None, literal: bool = False
+) -> Dict[str, Any]:
+    """
+    {"task_id": ...} for the task `task_title` clearly refers to, otherwise an
+    error with the closest candidates for the user to choose from.
+    With `literal`, only a title equal to or containing `task_title` resolves;
+    a merely similar one comes back as a candidate to confirm.
+    """
+    if not task_title or not task_title.strip():
+        return {"error": "Task title is required"}
+    candidates = await title_candidates(session, user_id, task_title, status)
+    match = best_match(task_title, candidates)
+    if match and (not literal or names_title(task_title, match["title"])):
+        return {"task_id": match["id"]}
+    if not candidates:
+        return {"error": f"No task matches '{task_title}'"}
+    if match:
+        error = f"No task is titled '{task_title}'; confirm which one was meant"
+    else:
+        error = f"'{task_title}' matches several tasks; ask which one was meant"
+    return {
+        "error": error,
+        "candidates": [{"id": c["id"], "title": c["title"], "status": c["status"]} for c in candidates]
+    }
+
+async def complete_task_by_title(session: AsyncSession, user_id: str, task_title: str) -> Dict[str, Any]:
+    """
+    Mark the pending task best matching a title as complete.
+    """
+    resolved = await _resolve_title(session, user_id, task_title, status="pending")
+    if "task_id" not in resolved:
+        return resolved
+    return await complete_task(session, user_id, resolved["task_id"])
+
+async def update_task_by_title(session: AsyncSession, user_id: str, task_title: str, **changes) -> Dict[str, Any]:
+    """
+    Update the task best matching a title; `changes` are update_task's fields.
+    """
+    resolved = await _resolve_title(session, user_id, task_title)
+    if "task_id" not in resolved:
+        return resolved
+    return await update_task(session, user_id, resolved["task_id"], **changes)
+
+async def delete_task_by_title(session: AsyncSession, user_id: str, task_title: str) -> Dict[str, Any]:
+    """
+    Delete the task whose title is or contains `task_title`; similar titles
+    are only offered as candidates.
+    """
+    resolved = await _resolve_title(session, user_id, task_title, literal=True)
+    if "task_id" not in resolved:
+        return resolved
+    return await delete_task(session, user_id, resolved["task_id"])
@@ -1,126 +1,269 @@
+"""
+Schema migration runner.
+
+Reflects the live schema once, diffs it against the SQLModel metadata and
+applies only the missing DDL in a single transaction, then records a schema
+version. App startup calls ensure_schema(), which skips DDL entirely when the
+recorded version matches the models.
+
+    python migrate_db.py           # migrate if the version differs
+    python migrate_db.py --force   # re-diff even if the version matches
+"""
+import hashlib
 import os
-from sqlmodel import create_engine, text
+import sys
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, UniqueConstraint, inspect, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+from sqlmodel import SQLModel, text
 from dotenv import load_dotenv
+from config.database import engine
+from models.user import User  # noqa: F401
+from models.task import Task  # noqa: F401
+from models.conversation import Conversation  # noqa: F401
+from models.message import Message  # noqa: F401
+from models.auth import Session as AuthSession, Account, Verification  # noqa: F401
+from models.outbox import OutboxEvent  # noqa: F401
+from core.task_search import PG_DROP_LEGACY_SEARCH, SQLITE_SEARCH_DDL, SQLITE_SEARCH_TABLE, pg_task_search
+from core.task_titles import PG_TRGM_EXTENSION, pg_task_titles
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+# Set AUTO_MIGRATE=false to only report schema drift at startup
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
 
-def migrate():
-    with engine.connect() as conn:
-        print("Starting comprehensive migration...")
-        
-        # Helper to add columns safely and drop NOT NULL
-        def sanitize_column(table, col, type_info):
+# Bump when the runner's own behaviour changes in a way the models don't show
+RUNNER_REVISION = 3
+
+# Serialises migrations across pods starting at the same time (Postgres only)
+MIGRATION_LOCK_ID = 72817001
+
+# Better Auth writes either naming convention, so these tables keep every
+# non-key column nullable, plus a few camelCase columns the models don't declare
+RELAXED_TABLES = {"user", "session", "account", "verification", "task"}
+LEGACY_COLUMNS = {
+    "user": [
+        ("emailVerified", "BOOLEAN"),
+        ("password", "VARCHAR(255)"),
+        ("createdAt", "TIMESTAMP"),
+        ("updatedAt", "TIMESTAMP"),
+    ],
+    "account": [
+        ("refreshToken", "TEXT"),
+        ("idToken", "TEXT"),
+        ("id_token", "TEXT"),
+        ("expiresAt", "TIMESTAMP"),
+        ("expires_at", "TIMESTAMP"),
+    ],
+}
+
+# Schema the models can't declare portably: idempotent statements run first,
+# extra columns and indexes merged into model tables, and raw DDL applied
+# when its marker table is missing
+DIALECT_PRELUDE = {"postgresql": [PG_DROP_LEGACY_SEARCH]}
+DIALECT_TABLES = {"postgresql": [pg_task_search]}
+# Extensions, each with the extra tables that need it. Installed outside the
+# migration transaction; without the privilege to install one, its tables
+# are skipped rather than failing the migration (and with it app startup).
+DIALECT_EXTENSIONS = {"postgresql": [(PG_TRGM_EXTENSION, [pg_task_titles])]}
+DIALECT_DDL = {"sqlite": {SQLITE_SEARCH_TABLE: SQLITE_SEARCH_DDL}}
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", String(64), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def schema_fingerprint() -> str:
+    """Stable hash of everything the runner would create from the models."""
+    parts = [f"runner:{RUNNER_REVISION}"]
+    for table in sorted(SQLModel.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table:{table.name}")
+        for column in table.columns:
+            computed = column.computed.sqltext if column.computed is not None else None
+            parts.append(f"column:{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}:{computed}")
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            where = index.dialect_options["postgresql"].get("where")
+            parts.append(f"index:{index.name}:{[str(e) for e in index.expressions]}:{index.unique}:{where}")
+        parts.append(f"legacy:{LEGACY_COLUMNS.get(table.name)}:{table.name in RELAXED_TABLES}")
+    extension_tables = {
+        dialect_name: [table for _, tables in extensions for table in tables]
+        for dialect_name, extensions in DIALECT_EXTENSIONS.items()
+    }
+    for dialect_name in sorted(set(DIALECT_TABLES) | set(extension_tables)):
+        for table in DIALECT_TABLES.get(dialect_name, []) + extension_tables.get(dialect_name, []):
+            columns = [f"{c.name}:{c.type!r}:{getattr(c.computed, 'sqltext', None)}" for c in table.columns]
+            indexes = sorted(f"{i.name}:{[str(e) for e in i.expressions]}:{sorted(i.dialect_kwargs.items())}" for i in table.indexes)
+            parts.append(f"dialect:{dialect_name}:{table.name}:{columns}:{indexes}")
+    for dialect_name, ddl in sorted(DIALECT_DDL.items()):
+        parts.append(f"dialect:{dialect_name}:{sorted(ddl.items())}")
+    parts.append(f"prelude:{sorted(DIALECT_PRELUDE.items())}")
+    parts.append(f"extensions:{sorted((d, [ddl for ddl, _ in exts]) for d, exts in DIALECT_EXTENSIONS.items())}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+SCHEMA_VERSION = schema_fingerprint()
+
+def recorded_version(conn):
+    if not inspect(conn).has_table(schema_version.name):
+        return None
+    return conn.execute(select(schema_version.c.version).where(schema_version.c.id == 1)).scalar()
+
+def column_ddl(column, dialect) -> str:
+    """
+    Type for ADD COLUMN. Computed columns keep their GENERATED ALWAYS AS
+    clause, so the database fills them in for existing rows.
+    """
+    if column.computed is None:
+        return column.type.compile(dialect=dialect)
+    clause = str(CreateColumn(column).compile(dialect=dialect))
+    return clause.split(" ", 1)[1]
+
+def install_extensions() -> list:
+    """
+    Creates the dialect's extensions on an autocommit connection and returns
+    the extra tables whose extension is available.
+    """
+    tables = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for ddl, extension_tables in DIALECT_EXTENSIONS.get(conn.dialect.name, []):
             try:
-                # Add if not exists
-                conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS "{col}" {type_info}'))
-                # Drop NOT NULL to be safe with name mapping
-                conn.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN "{col}" DROP NOT NULL'))
-                print(f"Sanitized column '{col}' in '{table}' table.")
-            except Exception as e:
-                print(f"Error sanitizing column '{col}' in '{table}': {e}")
-
-        # 1. User Table
-        user_cols = [
-            ("name", "VARCHAR(255)"),
-            ("email_verified", "BOOLEAN"),
-            ("emailVerified", "BOOLEAN"),
-            ("image", "VARCHAR(1000)"),
-            ("password_hash", "VARCHAR(255)"),
-            ("password", "VARCHAR(255)"),
-            ("created_at", "TIMESTAMP"),
-            ("createdAt", "TIMESTAMP"),
-            ("updated_at", "TIMESTAMP"),
-            ("updatedAt", "TIMESTAMP")
-        ]
-        for name, type_info in user_cols:
-            sanitize_column("user", name, type_info)
-
-        # 2. Session Table
-        conn.execute(text('CREATE TABLE IF NOT EXISTS "session" (id VARCHAR(255) PRIMARY KEY)'))
-        session_cols = [
-            ("expiresAt", "TIMESTAMP"),
-            ("expires_at", "TIMESTAMP"),
-            ("token", "VARCHAR(255)"),
-            ("createdAt", "TIMESTAMP"),
-            ("created_at", "TIMESTAMP"),
-            ("updatedAt", "TIMESTAMP"),
-            ("updated_at", "TIMESTAMP"),
-            ("ipAddress", "VARCHAR(255)"),
-            ("ip_address", "VARCHAR(255)"),
-            ("userAgent", "VARCHAR(255)"),
-            ("user_agent", "VARCHAR(255)"),
-            ("userId", "VARCHAR(255)"),
-            ("user_id", "VARCHAR(255)")
-        ]
-        for name, type_info in session_cols:
-            sanitize_column("session", name, type_info)
-
-        # 3. Account Table
-        conn.execute(text('CREATE TABLE IF NOT EXISTS "account" (id VARCHAR(255) PRIMARY KEY)'))
-        account_cols = [
-            ("accountId", "VARCHAR(255)"),
-            ("account_id", "VARCHAR(255)"),
-            ("providerId", "VARCHAR(255)"),
-            ("provider_id", "VARCHAR(255)"),
-            ("userId", "VARCHAR(255)"),
-            ("user_id", "VARCHAR(255)"),
-            ("accessToken", "TEXT"),
-            ("access_token", "TEXT"),
-            ("refreshToken", "TEXT"),
-            ("refresh_token", "TEXT"),
-            ("idToken", "TEXT"),
-            ("id_token", "TEXT"),
-            ("expiresAt", "TIMESTAMP"),
-            ("expires_at", "TIMESTAMP"),
-            ("password", "TEXT"),
-            ("createdAt", "TIMESTAMP"),
-            ("created_at", "TIMESTAMP"),
-            ("updatedAt", "TIMESTAMP"),
-            ("updated_at", "TIMESTAMP")
-        ]
-        for name, type_info in account_cols:
-            sanitize_column("account", name, type_info)
-
-        # 4. Verification Table
-        conn.execute(text('CREATE TABLE IF NOT EXISTS "verification" (id VARCHAR(255) PRIMARY KEY)'))
-        verification_cols = [
-            ("identifier", "VARCHAR(255)"),
-            ("value", "VARCHAR(255)"),
-            ("expiresAt", "TIMESTAMP"),
-            ("expires_at", "TIMESTAMP"),
-            ("createdAt", "TIMESTAMP"),
-            ("created_at", "TIMESTAMP"),
-            ("updatedAt", "TIMESTAMP"),
-            ("updated_at", "TIMESTAMP")
-        ]
-        for name, type_info in verification_cols:
-            sanitize_column("verification", name, type_info)
-        
-        # 5. Task Table (Phase 5 fields)
-        conn.execute(text('CREATE TABLE IF NOT EXISTS "task" (id TEXT PRIMARY KEY)'))
-        task_cols = [
-            ("title", "VARCHAR(255)"),
-            ("description", "TEXT"),
-            ("status", "VARCHAR(20)"),
-            ("priority", "VARCHAR(20)"),
-            ("tags", "TEXT"),
-            ("due_date", "TIMESTAMP"),
-            ("is_recurring", "BOOLEAN"),
-            ("recurrence_pattern", "VARCHAR(50)"),
-            ("user_id", "TEXT"),
-            ("created_at", "TIMESTAMP"),
-            ("completed_at", "TIMESTAMP")
-        ]
-        for name, type_info in task_cols:
-            sanitize_column("task", name, type_info)
-
-        conn.commit()
-        print("Successfully synchronized all tables and columns including Phase 5 features.")
-
-        print("Migration finished.")
+                conn.execute(text(ddl))
+            except DBAPIError as e:
+                print(f"Skipping {[t.name for t in extension_tables]} extras: '{ddl}' failed ({e.orig}).")
+                print("Install the extension as a privileged role, then run migrate_db.py --force.")
+                continue
+            tables += extension_tables
+    return tables
 
-if __name__ == "__main__":
+def constraint_index(constraint) -> Index:
+    """
+    Unique index standing in for a UniqueConstraint on a table that already
+    exists, since constraints can only be declared by CREATE TABLE.
+    """
+    columns = [c.name for c in constraint.columns]
+    name = constraint.name or f"ux_{constraint.table.name}_{'_'.join(columns)}"
+    stand_in = Table(
+        constraint.table.name,
+        MetaData(),
+        *(Column(c.name, c.type) for c in constraint.columns),
+        Index(name, *columns, unique=True),
+    )
+    return next(iter(stand_in.indexes))
+
+def plan_migration(conn, extension_tables=()):
+    """
+    Diffs the reflected schema against the models, plus `extension_tables`
+    from install_extensions().
+    Returns (ddl statements for one transaction, indexes to create afterwards).
+    """
+    inspector = inspect(conn)
+    dialect = conn.dialect
+    quote = dialect.identifier_preparer.quote
+    can_relax = dialect.name == "postgresql"
+    existing_tables = set(inspector.get_table_names())
+
+    statements = list(DIALECT_PRELUDE.get(dialect.name, []))
+    indexes = []
+    for table in SQLModel.metadata.sorted_tables:
+        relaxed = table.name in RELAXED_TABLES and can_relax
+        if table.name not in existing_tables:
+            statements.append(str(CreateTable(table).compile(dialect=dialect)))
+            live_columns = {c.name: {"nullable": c.nullable} for c in table.columns}
+            existing_indexes = set()
+        else:
+            live_columns = {c["name"]: c for c in inspector.get_columns(table.name)}
+            live_indexes = inspector.get_indexes(table.name)
+            live_uniques = inspector.get_unique_constraints(table.name)
+            existing_indexes = {i["name"] for i in live_indexes} | {u["name"] for u in live_uniques}
+            # Unique constraints missing from the live table become unique indexes
+            unique_columns = {frozenset(u["column_names"]) for u in live_uniques}
+            unique_columns |= {frozenset(i["column_names"]) for i in live_indexes if i["unique"]}
+            indexes += [
+                constraint_index(constraint)
+                for constraint in sorted(table.constraints, key=lambda c: [col.name for col in c.columns])
+                if isinstance(constraint, UniqueConstraint)
+                and frozenset(c.name for c in constraint.columns) not in unique_columns
+            ]
+
+        dialect_tables = DIALECT_TABLES.get(dialect.name, []) + list(extension_tables)
+        extras = [extra for extra in dialect_tables if extra.name == table.name]
+        columns = list(table.columns) + [c for extra in extras for c in extra.columns if c.name not in table.c]
+        wanted = [(c.name, column_ddl(c, dialect), c.primary_key) for c in columns]
+        wanted += [(name, type_info, False) for name, type_info in LEGACY_COLUMNS.get(table.name, [])]
+        for name, type_info, primary_key in wanted:
+            if name not in live_columns:
+                statements.append(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(name)} {type_info}")
+            elif relaxed and not primary_key and not live_columns[name]["nullable"]:
+                statements.append(f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(name)} DROP NOT NULL")
+
+        table_indexes = set(table.indexes).union(*(extra.indexes for extra in extras))
+        indexes += [i for i in sorted(table_indexes, key=lambda i: i.name) if i.name not in existing_indexes]
+
+    for marker, ddl in DIALECT_DDL.get(dialect.name, {}).items():
+        if marker not in existing_tables:
+            statements += ddl
+
+    return statements, indexes
+
+def create_indexes(indexes):
+    """
+    Builds the given indexes. On Postgres they are built CONCURRENTLY so
+    writes keep flowing, which requires autocommit rather than a transaction.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        concurrent = conn.dialect.name == "postgresql"
+        for index in indexes:
+            ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+            if concurrent:
+                ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+            conn.execute(text(ddl))
+            print(f"Created index '{index.name}' on '{index.table.name}'.")
+
+def record_version():
+    with engine.begin() as conn:
+        version_metadata.create_all(bind=conn)
+        conn.execute(schema_version.delete())
+        conn.execute(schema_version.insert().values(id=1, version=SCHEMA_VERSION, applied_at=datetime.utcnow()))
+
+def migrate(force: bool = False):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        locking = lock_conn.dialect.name == "postgresql"
+        if locking:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            # Another pod may have finished while we waited on the lock
+            if not force and recorded_version(lock_conn) == SCHEMA_VERSION:
+                print("Schema is up to date.")
+                return
+
+            extension_tables = install_extensions()
+            with engine.begin() as conn:
+                statements, indexes = plan_migration(conn, extension_tables)
+                for ddl in statements:
+                    conn.execute(text(ddl))
+                    print(f"Applied: {ddl.strip().splitlines()[0]}")
+
+            create_indexes(indexes)
+            record_version()
+            print(f"Migration finished: {len(statements)} statements, {len(indexes)} indexes, version {SCHEMA_VERSION[:12]}.")
+        finally:
+            if locking:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+def ensure_schema():
+    """Startup hook: one version lookup, and DDL only when the models changed."""
+    with engine.connect() as conn:
+        current = recorded_version(conn)
+    if current == SCHEMA_VERSION:
+        return
+    if not AUTO_MIGRATE:
+        print(f"Schema version {current} does not match {SCHEMA_VERSION[:12]}; run migrate_db.py")
+        return
     migrate()
+
+if __name__ == "__main__":
+    migrate(force="--force" in sys.argv)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
 from datetime import datetime
@@ -6,10 +7,17 @@ class Session(SQLModel, table=True):
     """
     Better Auth Session table supporting both camelCase and snake_case
     """
+    __table_args__ = (
+        # Every authenticated request looks up its session by token. Declared
+        # as an index (not a unique constraint) so migrate_db also adds it to
+        # session tables it did not create.
+        Index("ix_session_token", "token", unique=True),
+    )
+
     id: str = Field(primary_key=True)
-    expires_at: Optional[datetime] = None
-    expiresAt: Optional[datetime] = None
-    token: str = Field(unique=True)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
+    expiresAt: Optional[datetime] = Field(default=None, index=True)
+    token: str
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     createdAt: Optional[datetime] = None
     updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
@@ -50,8 +58,8 @@ class Verification(SQLModel, table=True):
     id: str = Field(primary_key=True)
     identifier: str
     value: str
-    expires_at: Optional[datetime] = None
-    expiresAt: Optional[datetime] = None
+    expires_at: Optional[datetime] = Field(default=None, index=True)
+    expiresAt: Optional[datetime] = Field(default=None, index=True)
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     createdAt: Optional[datetime] = None
     updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
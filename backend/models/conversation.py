@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from datetime import datetime
@@ -15,6 +16,10 @@ class Conversation(ConversationBase, table=True):
     """
     Conversation model for storing chat sessions
     """
+    __table_args__ = (
+        Index("ix_conversation_user_created", "user_id", "created_at"),
+    )
+
     id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     user_id: str = Field(foreign_key="user.id")
 
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
 from datetime import datetime
@@ -15,6 +16,10 @@ class Message(MessageBase, table=True):
     """
     Message model storing individual chat turns
     """
+    __table_args__ = (
+        Index("ix_message_conversation_created", "conversation_id", "created_at"),
+    )
+
     id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     conversation_id: str = Field(foreign_key="conversation.id")
 
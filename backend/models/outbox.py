@@ -0,0 +1,23 @@
+from sqlalchemy import JSON, Column, Index
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+class OutboxEvent(SQLModel, table=True):
+    """
+    Pub/sub event written in the same transaction as the change it announces;
+    the outbox relay publishes it to Dapr and deletes it
+    """
+    __tablename__ = "outbox_event"
+    __table_args__ = (
+        # Relay scan: due events in insertion order
+        Index("ix_outbox_event_due", "next_attempt_at", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    pubsub: str
+    topic: str
+    payload: dict = Field(sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    attempts: int = Field(default=0)
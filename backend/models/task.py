@@ -1,8 +1,13 @@
+from sqlalchemy import Column, Computed, Index, SmallInteger, text
 from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
+# Sort rank for priority: high -> 0, medium -> 1, low -> 2, anything else last
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+PRIORITY_RANK_SQL = "CASE priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 WHEN 'low' THEN 2 ELSE 3 END"
+
 class TaskBase(SQLModel):
     """
     Base task model following Better Auth principles for task data structure
@@ -17,24 +22,127 @@ class TaskBase(SQLModel):
     recurrence_pattern: Optional[str] = Field(default=None) # daily, weekly, monthly
     
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
     completed_at: Optional[datetime] = Field(default=None)
 
 class Task(TaskBase, table=True):
     """
     Task model compliant with Better Auth standards for user-scoped task management
     """
+    __table_args__ = (
+        # Task list: per-user, optionally filtered by status, sorted by created_at or due_date
+        Index("ix_task_user_created", "user_id", "created_at"),
+        Index("ix_task_user_due", "user_id", "due_date"),
+        Index("ix_task_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_task_user_status_due", "user_id", "status", "due_date"),
+        # Priority sort: rank ascending, newest first within a rank
+        Index("ix_task_user_priority", "user_id", "priority_rank", text("created_at DESC"), text("id DESC")),
+        Index(
+            "ix_task_user_status_priority",
+            "user_id", "status", "priority_rank", text("created_at DESC"), text("id DESC"),
+        ),
+        # Delta sync: a user's tasks written after a task-list version
+        Index("ix_task_user_version", "user_id", "version"),
+        # One recurrence per task.completed event, however often it is delivered
+        Index("ux_task_source_event", "source_event_id", unique=True),
+        # Notification service's reminder scan over pending tasks in a due window
+        Index(
+            "ix_task_pending_due",
+            "due_date",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
     id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     user_id: str = Field(foreign_key="user.id")
+    # Task-list version of the transaction that last wrote this task
+    version: Optional[int] = Field(default=None)
+    # event_id of the task.completed event the recurring engine created this from
+    source_event_id: Optional[str] = Field(default=None)
+    # Generated from priority by the database, so every writer (including the
+    # recurring engine) keeps it in step without setting it
+    priority_rank: Optional[int] = Field(
+        default=None, sa_column=Column(SmallInteger, Computed(PRIORITY_RANK_SQL))
+    )
 
     # Relationship to User (forward reference)
     user: Optional["User"] = Relationship(back_populates="tasks")
 
+class TaskListVersion(SQLModel, table=True):
+    """
+    Per-user counter bumped by every task write; the source of task ETags
+    """
+    __tablename__ = "task_list_version"
+
+    user_id: str = Field(foreign_key="user.id", primary_key=True)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class TaskTombstone(SQLModel, table=True):
+    """
+    Record of a deleted task so delta sync can report the deletion
+    """
+    __tablename__ = "task_tombstone"
+    __table_args__ = (
+        Index("ix_task_tombstone_user_version", "user_id", "version"),
+    )
+
+    id: str = Field(primary_key=True) # id of the deleted task
+    user_id: str
+    version: int
+    deleted_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class Tag(SQLModel, table=True):
+    """
+    A user's tag, normalized out of the comma-separated Task.tags
+    """
+    __tablename__ = "tag"
+    __table_args__ = (
+        Index("ux_tag_user_name", "user_id", "name", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str = Field(foreign_key="user.id")
+    name: str
+
+class TaskTag(SQLModel, table=True):
+    """
+    Task to tag association; the key leads with tag_id so a tag filter is a range scan
+    """
+    __tablename__ = "task_tag"
+    __table_args__ = (
+        Index("ix_task_tag_task", "task_id"),
+    )
+
+    tag_id: int = Field(foreign_key="tag.id", primary_key=True)
+    task_id: str = Field(foreign_key="task.id", primary_key=True)
+
 class TaskRead(TaskBase):
     """
     Task read model following Better Auth principles for task data exposure
     """
     id: str
     user_id: str
+    version: Optional[int] = None
+
+class TaskChanges(SQLModel):
+    """
+    Delta since a sync token: tasks created or changed, ids deleted, and the
+    token to send next time. `reset` means the old token expired and
+    `upserts` holds the full list.
+    """
+    upserts: List[TaskRead]
+    deleted: List[str]
+    token: str
+    reset: bool = False
+
+class TagCount(SQLModel):
+    """
+    One of the user's tags and the number of their tasks carrying it
+    """
+    tag: str
+    count: int
 
 class TaskCreate(TaskBase):
     """
@@ -53,4 +161,30 @@ class TaskUpdate(SQLModel):
     tags: Optional[str] = None
     due_date: Optional[datetime] = None
     is_recurring: Optional[bool] = None
-    recurrence_pattern: Optional[str] = None
\ No newline at end of file
+    recurrence_pattern: Optional[str] = None
+
+class TaskBatchOperation(SQLModel):
+    """
+    One item of a batch request: `task` for create, `id` + `changes` for update,
+    `id` alone for complete and delete
+    """
+    op: str = Field(regex="^(create|update|complete|delete)$")
+    id: Optional[str] = None
+    task: Optional[TaskCreate] = None
+    changes: Optional[TaskUpdate] = None
+
+class TaskBatchRequest(SQLModel):
+    """
+    Batch of task operations applied in a single transaction
+    """
+    operations: List[TaskBatchOperation]
+
+class TaskBatchResult(SQLModel):
+    """
+    Per-operation outcome of a batch, in request order
+    """
+    index: int
+    op: str
+    id: Optional[str] = None
+    status: str # created, updated, completed, deleted, not_found, invalid
+    task: Optional[TaskRead] = None
@@ -1,5 +1,6 @@
 #!/bin/bash
 eval $(minikube docker-env)
 docker build -t todo-backend:latest ./backend
-docker build -t todo-recurring:latest ./services/recurring_engine
-docker build -t todo-notification:latest ./services/notification_service
+# The services copy core/dapr_client.py from the backend context
+docker build -t todo-recurring:latest --build-context backend=./backend ./services/recurring_engine
+docker build -t todo-notification:latest --build-context backend=./backend ./services/notification_service
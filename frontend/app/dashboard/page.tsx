@@ -27,16 +27,32 @@ export default function DashboardPage() {
   const [error, setError] = useState<string | null>(null);
   
   const [searchQuery, setSearchQuery] = useState('');
+  const [debouncedQuery, setDebouncedQuery] = useState('');
   const [statusFilter, setStatusFilter] = useState('all');
   const [sortBy, setSortBy] = useState('created_at');
+  // Bumped by the live event stream to refetch with the current filters
+  const [changeCount, setChangeCount] = useState(0);
 
   const fetchTasks = async () => {
     setLoading(true);
     try {
-      const response = await apiClient.get('/api/tasks', {
-        params: { status: statusFilter, sort: sortBy }
-      });
-      setTasks(response.data);
+      // Searches run server-side and return the best matches first, a page
+      // at a time; follow X-Next-Cursor until the last page
+      const results: Task[] = [];
+      let cursor: string | undefined;
+      do {
+        const response = await apiClient.get('/api/tasks', {
+          params: {
+            status: statusFilter,
+            sort: sortBy,
+            ...(debouncedQuery ? { q: debouncedQuery } : {}),
+            ...(cursor ? { cursor } : {})
+          }
+        });
+        results.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      setTasks(results);
     } catch (err: any) {
       setError(err.message || 'An error occurred while fetching tasks');
     } finally {
@@ -44,6 +60,11 @@ export default function DashboardPage() {
     }
   };
 
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery.trim()), 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
   useEffect(() => {
     if (isPending) return;
     if (!sessionData) {
@@ -51,7 +72,41 @@ export default function DashboardPage() {
       return;
     }
     fetchTasks();
-  }, [sessionData, isPending, statusFilter, sortBy]);
+  }, [sessionData, isPending, statusFilter, sortBy, debouncedQuery, changeCount]);
+
+  useEffect(() => {
+    if (isPending || !sessionData) return;
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const connect = async () => {
+      try {
+        // EventSource can't send an Authorization header, so the stream
+        // takes a short-lived token in the query string instead
+        const { data } = await apiClient.post('/api/tasks/events/token');
+        if (closed) return;
+        const baseURL = (apiClient.defaults.baseURL || '').replace(/\/$/, '');
+        source = new EventSource(`${baseURL}/api/tasks/events?token=${encodeURIComponent(data.token)}`);
+        const refresh = () => setChangeCount((count) => count + 1);
+        ['upsert', 'delete', 'resync'].forEach((type) => source?.addEventListener(type, refresh));
+        source.onerror = () => {
+          // Reconnect with a fresh token; the old one may have expired
+          source?.close();
+          if (!closed) retry = setTimeout(connect, 5000);
+        };
+      } catch {
+        if (!closed) retry = setTimeout(connect, 5000);
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      source?.close();
+    };
+  }, [sessionData, isPending]);
 
   const handleDelete = async (taskId: string) => {
     if (!confirm('Are you sure you want to delete this task?')) return;
@@ -63,11 +118,6 @@ export default function DashboardPage() {
     }
   };
 
-  const filteredTasks = tasks.filter(task => 
-    task.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    (task.tags && task.tags.toLowerCase().includes(searchQuery.toLowerCase()))
-  );
-
   if (isPending) {
     return (
       <div className="min-h-screen flex items-center justify-center bg-transparent">
@@ -153,7 +203,7 @@ export default function DashboardPage() {
                 <div key={i} className="glass-card h-64 animate-pulse opacity-50" />
               ))}
            </div>
-        ) : filteredTasks.length === 0 ? (
+        ) : tasks.length === 0 ? (
            <div className="glass-card py-32 flex flex-col items-center justify-center text-center space-y-6">
               <div className="w-20 h-20 rounded-full bg-white/5 flex items-center justify-center text-slate-500 border border-white/10">
                  <svg className="w-10 h-10" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth="1.5" d="M19 11H5m14 0a2 2 0 012 2v6a2 2 0 01-2 2H5a2 2 0 01-2-2v-6a2 2 0 012-2m14 0V9a2 2 0 00-2-2M5 11V9a2 2 0 012-2m0 0V5a2 2 0 012-2h6a2 2 0 012 2v2M7 7h10" /></svg>
@@ -165,7 +215,7 @@ export default function DashboardPage() {
            </div>
         ) : (
            <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-8">
-              {filteredTasks.map((task) => (
+              {tasks.map((task) => (
                 <div key={task.id} className={`group relative glass-card p-6 flex flex-col gap-4 hover:border-indigo-500/50 transition-all duration-500 ${task.status === 'completed' ? 'opacity-40 grayscale-[0.5]' : ''}`}>
                    
                    {/* Priority Indicator */}
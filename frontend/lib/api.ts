@@ -21,9 +21,17 @@ const apiClient = axios.create({
   },
 });
 
+// Expiry (epoch seconds) of the read-your-writes pin the API returned after
+// our last write; sent back so reads stay on the primary on every pod
+let replicaPin = 0;
+
 // Request interceptor to add auth token
 apiClient.interceptors.request.use(
   async (config) => {
+    if (replicaPin > Date.now() / 1000) {
+      config.headers['X-Replica-Pin'] = String(replicaPin);
+    }
+
     // Better Auth stores the session in a cookie, but we can also get 
     // the session object which contains the token string.
     const { data: session } = await authClient.getSession();
@@ -43,7 +51,13 @@ apiClient.interceptors.request.use(
 
 // Response interceptor to handle session expiration
 apiClient.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const pin = Number(response.headers['x-replica-pin']);
+    if (pin) {
+      replicaPin = pin;
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       // Redirect to login if session is invalid/expired
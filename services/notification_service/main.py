@@ -2,55 +2,55 @@ from fastapi import FastAPI, Body
 from dapr.ext.fastapi import DaprApp
 from sqlmodel import Session, select
 from datetime import datetime, timedelta
-from database import engine
+from pathlib import Path
+import sys
+from database import read_engine
 from models import Task
-import httpx
-import os
-import json
+try:
+    # Images copy the backend's client in at build time (see Dockerfile)
+    from dapr_client import DAPR_HTTP_PORT, dapr
+except ImportError:
+    # Running from a checkout: use backend/core/dapr_client.py in place
+    sys.path.append(str(Path(__file__).resolve().parents[2] / "backend" / "core"))
+    from dapr_client import DAPR_HTTP_PORT, dapr
 
 app = FastAPI(title="Notification Service", version="1.0.0")
 dapr_app = DaprApp(app)
 
-DAPR_HTTP_PORT = os.getenv("DAPR_HTTP_PORT", "3500")
-DAPR_BASE_URL = f"http://localhost:{DAPR_HTTP_PORT}"
+STATE_STORE = "statestore"
 
 print("🔔 Notification Service Starting...")
 print(f"📡 Dapr HTTP Port: {DAPR_HTTP_PORT}")
 
 # ============ DAPR STATE HELPERS ============
 
+def notification_key(task_id: str, user_id: str) -> str:
+    """One notification per task per day"""
+    return f"notification:{user_id}:{task_id}:{datetime.utcnow().date()}"
+
+def notification_state(task_id: str, user_id: str, notification_type: str) -> dict:
+    return {
+        "task_id": task_id,
+        "user_id": user_id,
+        "sent_at": datetime.utcnow().isoformat(),
+        "notification_type": notification_type
+    }
+
 async def save_notification_state(task_id: str, user_id: str, notification_type: str):
     """Save notification state to prevent duplicates"""
-    try:
-        async with httpx.AsyncClient() as client:
-            key = f"notification:{user_id}:{task_id}:{datetime.utcnow().date()}"
-            value = {
-                "task_id": task_id,
-                "user_id": user_id,
-                "sent_at": datetime.utcnow().isoformat(),
-                "notification_type": notification_type
-            }
-            url = f"{DAPR_BASE_URL}/v1.0/state/statestore"
-            payload = [{"key": key, "value": value}]
-            await client.post(url, json=payload)
-            print(f"💾 Saved notification state: {key}")
-    except Exception as e:
-        print(f"❌ State save error: {e}")
+    key = notification_key(task_id, user_id)
+    if await dapr.save_state(STATE_STORE, key, notification_state(task_id, user_id, notification_type)):
+        print(f"💾 Saved notification state: {key}")
 
-async def check_notification_sent(task_id: str, user_id: str) -> bool:
-    """Check if notification was already sent today"""
-    try:
-        async with httpx.AsyncClient() as client:
-            key = f"notification:{user_id}:{task_id}:{datetime.utcnow().date()}"
-            url = f"{DAPR_BASE_URL}/v1.0/state/statestore/{key}"
-            response = await client.get(url)
-            if response.status_code == 200 and response.text:
-                print(f"✅ Notification already sent: {key}")
-                return True
-            return False
-    except Exception as e:
-        print(f"❌ State check error: {e}")
-        return False
+# ============ LIFECYCLE ============
+
+@app.on_event("startup")
+async def open_dapr_client():
+    await dapr.start()
+
+@app.on_event("shutdown")
+async def close_dapr_client():
+    await dapr.close()
 
 # ============ EVENT HANDLERS ============
 
@@ -96,7 +96,7 @@ async def reminder_check_handler(event_data = Body(...)):
     tomorrow = now + timedelta(hours=24)
     
     try:
-        with Session(engine) as session:
+        with Session(read_engine()) as session:
             # Query tasks due in next 24 hours that are not completed
             statement = select(Task).where(
                 Task.due_date != None,
@@ -105,43 +105,43 @@ async def reminder_check_handler(event_data = Body(...)):
                 Task.status == "pending"
             )
             tasks = session.exec(statement).all()
+        
+        print(f"   Found {len(tasks)} tasks due soon")
+        
+        # One bulk read for every reminder already sent today
+        keys = {task.id: notification_key(task.id, task.user_id) for task in tasks}
+        already_sent = await dapr.get_bulk_state(STATE_STORE, list(keys.values()))
+        new_states = {}
+        
+        for task in tasks:
+            if keys[task.id] in already_sent:
+                continue
+            
+            # Calculate time until due
+            time_until_due = task.due_date - now
+            hours_until = int(time_until_due.total_seconds() / 3600)
             
-            print(f"   Found {len(tasks)} tasks due soon")
+            # Format notification message
+            message = f"⏰ Reminder: '{task.title}' is due in {hours_until} hours"
+            if task.priority == "high":
+                message = f"🔴 URGENT: {message}"
             
-            for task in tasks:
-                # Check if we already sent a reminder today
-                already_sent = await check_notification_sent(task.id, task.user_id)
-                if already_sent:
-                    continue
-                
-                # Calculate time until due
-                time_until_due = task.due_date - now
-                hours_until = int(time_until_due.total_seconds() / 3600)
-                
-                # Format notification message
-                message = f"⏰ Reminder: '{task.title}' is due in {hours_until} hours"
-                if task.priority == "high":
-                    message = f"🔴 URGENT: {message}"
-                
-                print(f"\n   📢 Sending reminder:")
-                print(f"      Task: {task.title}")
-                print(f"      User: {task.user_id}")
-                print(f"      Due: {task.due_date}")
-                print(f"      Message: {message}")
-                
-                # Save notification state to prevent duplicates
-                await save_notification_state(
-                    task_id=task.id,
-                    user_id=task.user_id,
-                    notification_type="due_date_reminder"
-                )
-                
-                notifications_sent.append({
-                    "task_id": task.id,
-                    "title": task.title,
-                    "user_id": task.user_id,
-                    "message": message
-                })
+            print(f"\n   📢 Sending reminder:")
+            print(f"      Task: {task.title}")
+            print(f"      User: {task.user_id}")
+            print(f"      Due: {task.due_date}")
+            print(f"      Message: {message}")
+            
+            new_states[keys[task.id]] = notification_state(task.id, task.user_id, "due_date_reminder")
+            notifications_sent.append({
+                "task_id": task.id,
+                "title": task.title,
+                "user_id": task.user_id,
+                "message": message
+            })
+        
+        # Save notification state to prevent duplicates, in one bulk write
+        await dapr.save_bulk_state(STATE_STORE, new_states)
     
     except Exception as e:
         print(f"   ❌ Error checking reminders: {e}")
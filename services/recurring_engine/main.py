@@ -1,24 +1,101 @@
 from fastapi import FastAPI, Body
+from fastapi.concurrency import run_in_threadpool
 from dapr.ext.fastapi import DaprApp
-from sqlmodel import Session, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
 from datetime import datetime, timedelta
+from typing import Optional
+from pathlib import Path
 import os
 import sys
 
-# Add parent dir to path to import models if needed, 
-# but in Docker we will structure it correctly.
 from database import engine
-from models import Task
+from models import Task, TaskListVersion
+try:
+    # Images copy the backend's client in at build time (see Dockerfile)
+    from dapr_client import dapr
+except ImportError:
+    # Running from a checkout: use backend/core/dapr_client.py in place
+    sys.path.append(str(Path(__file__).resolve().parents[2] / "backend" / "core"))
+    from dapr_client import dapr
 
 app = FastAPI(title="Recurring Task Engine")
 dapr_app = DaprApp(app)
 
+# Per-pod pub/sub component the backend replicas read task.changed from
+TASK_EVENTS_PUBSUB = os.getenv("TASK_EVENTS_PUBSUB", "task-events")
+
+def bump_task_list_version(session: Session, user_id: str) -> int:
+    """Same upsert as the backend, so ETags and delta-sync tokens see the new task."""
+    table = TaskListVersion.__table__
+    insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+    now = datetime.utcnow()
+    return session.execute(
+        insert(table)
+        .values(user_id=user_id, version=1, updated_at=now)
+        .on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"version": table.c.version + 1, "updated_at": now},
+        )
+        .returning(table.c.version)
+    ).scalar_one()
+
+async def publish_task_changed(events: list):
+    """Lets the backend push the new task to the owner's open event streams."""
+    payload = {"origin": "recurring-engine", "events": events}
+    if not await dapr.publish_event(TASK_EVENTS_PUBSUB, "task.changed", payload):
+        print("Task change publish error")
+
+@app.on_event("startup")
+async def open_dapr_client():
+    await dapr.start()
+
+@app.on_event("shutdown")
+async def close_dapr_client():
+    await dapr.close()
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+def create_next_instance(user_id: str, title: str, pattern: str, next_due: datetime, event_id: Optional[str]) -> Optional[dict]:
+    """
+    Inserts the next occurrence; returns its task.changed event, or None if
+    the completion event `event_id` was already handled (a redelivery).
+    """
+    with Session(engine) as session:
+        version = bump_task_list_version(session, user_id)
+        new_task = Task(
+            title=title,
+            description=f"Auto-generated mission objective based on {pattern} pattern.",
+            status="pending",
+            priority="medium", # Default for new recurring task
+            is_recurring=True,
+            recurrence_pattern=pattern,
+            user_id=user_id,
+            due_date=next_due,
+            version=version,
+            source_event_id=event_id
+        )
+        session.add(new_task)
+        event = {
+            "type": "upsert",
+            "user_id": user_id,
+            "id": new_task.id,
+            "version": version,
+            "task": new_task.model_dump(mode="json"),
+        }
+        try:
+            session.commit()
+        except IntegrityError:
+            # ux_task_source_event: this event already created its occurrence
+            session.rollback()
+            return None
+    return event
+
 @dapr_app.subscribe(pubsub='pubsub', topic='task.completed')
-def task_completed_handler(event_data = Body(...)):
+async def task_completed_handler(event_data = Body(...)):
     print(f"Received completion event: {event_data}")
     
     is_recurring = event_data.get('is_recurring', False)
@@ -41,20 +118,15 @@ def task_completed_handler(event_data = Body(...)):
     else:
         next_due = now + timedelta(days=1)
 
-    with Session(engine) as session:
-        new_task = Task(
-            title=title,
-            description=f"Auto-generated mission objective based on {pattern} pattern.",
-            status="pending",
-            priority="medium", # Default for new recurring task
-            is_recurring=True,
-            recurrence_pattern=pattern,
-            user_id=user_id,
-            due_date=next_due
-        )
-        session.add(new_task)
-        session.commit()
-        print(f"Created next instance for recurring task: {title}")
+    # The database work is blocking; keep it off the event loop
+    event_id = event_data.get('event_id')
+    event = await run_in_threadpool(create_next_instance, user_id, title, pattern, next_due, event_id)
+    if event is None:
+        print(f"Duplicate completion event {event_id} ignored")
+        return {"status": "ignored", "reason": "duplicate"}
+    print(f"Created next instance for recurring task: {title}")
+
+    await publish_task_changed([event])
 
     return {"status": "success", "next_due": next_due.isoformat()}
 
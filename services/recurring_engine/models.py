@@ -14,8 +14,20 @@ class TaskBase(SQLModel):
     recurrence_pattern: Optional[str] = Field(default=None)
     
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     completed_at: Optional[datetime] = Field(default=None)
 
 class Task(TaskBase, table=True):
     id: Optional[str] = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     user_id: str = Field() # No foreign key check needed in this microservice
+    version: Optional[int] = Field(default=None)
+    # event_id of the task.completed event this occurrence was created from;
+    # unique in the backend schema (ux_task_source_event)
+    source_event_id: Optional[str] = Field(default=None)
+
+class TaskListVersion(SQLModel, table=True):
+    __tablename__ = "task_list_version"
+
+    user_id: str = Field(primary_key=True)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)